@@ -3,6 +3,7 @@ import os
 from fastapi import Depends, HTTPException, status
 from sqlalchemy.orm import Session
 import json
+import threading
 
 from app.db import get_db
 from app.services.extraction_service import InformationExtractionService
@@ -14,45 +15,68 @@ from app.core.config import settings
 _LLM_EXTRACTOR = None
 # 创建LLMService全局单例
 _LLM_SERVICE = None
+# 同步依赖在线程池中并发执行，创建单例时加锁，避免并发的首批请求重复初始化（可重入：提取器初始化时会获取LLM服务）
+_SINGLETON_LOCK = threading.RLock()
 
 def get_llm_service():
     """获取LLM服务实例"""
     global _LLM_SERVICE
     if _LLM_SERVICE is None:
-        # 根据配置的模式决定使用API密钥还是本地服务器
-        if settings.LLM_MODE.lower() == "api":
-            # 创建LLM服务实例 - API模式
-            _LLM_SERVICE = LLMService(
-                model_name=settings.LLM_MODEL,
-                api_key=settings.LLM_API_KEY,
-                debug=settings.DEBUG,
-                use_api=True  # 显式指定使用API模式
-            )
-        else:
-            # 创建LLM服务实例 - 本地服务器模式
-            _LLM_SERVICE = LLMService(
-                model_name=settings.LLM_SERVER_MODEL,
-                server_ip=settings.LLM_SERVER_IP,
-                server_port=int(settings.LLM_SERVER_PORT),
-                debug=settings.DEBUG,
-                use_api=False  # 显式指定使用本地服务器模式
-            )
+        with _SINGLETON_LOCK:
+            if _LLM_SERVICE is None:
+                # 根据配置的模式决定使用API密钥还是本地服务器
+                if settings.LLM_MODE.lower() == "api":
+                    # 创建LLM服务实例 - API模式
+                    _LLM_SERVICE = LLMService(
+                        model_name=settings.LLM_MODEL,
+                        api_key=settings.LLM_API_KEY,
+                        debug=settings.DEBUG,
+                        use_api=True,  # 显式指定使用API模式
+                        json_mode=settings.LLM_JSON_MODE,
+                        prompt_cache=settings.LLM_PROMPT_CACHE,
+                        cache_dir=settings.LLM_CACHE_DIR
+                    )
+                else:
+                    # 创建LLM服务实例 - 本地服务器模式
+                    _LLM_SERVICE = LLMService(
+                        model_name=settings.LLM_SERVER_MODEL,
+                        server_ip=settings.LLM_SERVER_IP,
+                        server_port=int(settings.LLM_SERVER_PORT),
+                        debug=settings.DEBUG,
+                        use_api=False,  # 显式指定使用本地服务器模式
+                        json_mode=settings.LLM_JSON_MODE,
+                        cache_dir=settings.LLM_CACHE_DIR
+                    )
     return _LLM_SERVICE
 
 def get_llm_extractor():
     """获取LLM提取器实例"""
     global _LLM_EXTRACTOR
     if _LLM_EXTRACTOR is None:
-        # 获取LLM服务实例
-        llm_service = get_llm_service()
-        
-        # 初始化LLM提取器
-        _LLM_EXTRACTOR = LLMExtractor(
-            llm_service=llm_service,
-            debug=settings.DEBUG
-        )
+        with _SINGLETON_LOCK:
+            if _LLM_EXTRACTOR is None:
+                # 获取LLM服务实例
+                llm_service = get_llm_service()
+                
+                # 初始化LLM提取器
+                _LLM_EXTRACTOR = LLMExtractor(
+                    llm_service=llm_service,
+                    debug=settings.DEBUG
+                )
     return _LLM_EXTRACTOR
 
+def close_llm_singletons():
+    """关闭LLM提取器和LLM服务单例，释放后台事件循环和HTTP连接（应用关闭时调用）"""
+    global _LLM_EXTRACTOR, _LLM_SERVICE
+    with _SINGLETON_LOCK:
+        if _LLM_EXTRACTOR is not None:
+            # 提取器关闭时会一并关闭其使用的LLM服务
+            _LLM_EXTRACTOR.close()
+        elif _LLM_SERVICE is not None:
+            _LLM_SERVICE.close()
+        _LLM_EXTRACTOR = None
+        _LLM_SERVICE = None
+
 # 直接使用原始的get_db函数作为依赖
 get_db_session = get_db
 
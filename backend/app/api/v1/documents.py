@@ -1,5 +1,7 @@
+from datetime import datetime
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Body
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db_session
@@ -36,13 +38,18 @@ async def upload_documents(
 def get_all_documents(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor_time: Optional[datetime] = Query(None, description="游标分页：上一页最后一个文档的上传时间"),
+    cursor_id: Optional[int] = Query(None, description="游标分页：上一页最后一个文档的ID"),
     db: Session = Depends(get_db_session)
 ):
     """
     获取所有文档列表，支持分页
+    
+    同时提供cursor_time和cursor_id时使用游标分页（忽略skip），翻页深度不影响查询速度
     """
     document_service = DocumentService(db)
-    documents = document_service.get_all_documents(skip, limit)
+    cursor = (cursor_time, cursor_id) if cursor_time is not None and cursor_id is not None else None
+    documents = document_service.get_all_documents(skip, limit, cursor=cursor)
     return documents
 
 
@@ -102,4 +109,19 @@ def get_document_content(
     """
     document_service = DocumentService(db)
     content = document_service.get_document_content(document_id)
-    return content 
\ No newline at end of file
+    return content
+
+
+@router.get("/content/{document_id}/text")
+def get_document_content_text(
+    document_id: int,
+    db: Session = Depends(get_db_session)
+):
+    """
+    以纯文本形式获取文档内容
+    
+    直接以文件流返回提取出的文本文件，不需要将整个文件读入内存并进行JSON编码，适合内容较大的文档
+    """
+    document_service = DocumentService(db)
+    _, content_file_path = document_service.get_document_content_path(document_id)
+    return FileResponse(path=content_file_path, media_type="text/plain; charset=utf-8") 
\ No newline at end of file
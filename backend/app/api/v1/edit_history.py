@@ -1,5 +1,6 @@
-from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db_session, get_extraction_service
@@ -15,17 +16,23 @@ def get_document_edit_history(
     document_id: int,
     skip: int = 0,
     limit: int = 100,
+    cursor_time: Optional[datetime] = Query(None, description="游标分页：上一页最后一条记录的编辑时间"),
+    cursor_id: Optional[int] = Query(None, description="游标分页：上一页最后一条记录的ID"),
     db: Session = Depends(get_db_session)
 ):
     """
     获取文档的编辑历史
+    
+    同时提供cursor_time和cursor_id时使用游标分页（忽略skip），历史记录越多越能避免OFFSET扫描
     """
     edit_service = EditHistoryService(db)
     try:
+        cursor = (cursor_time, cursor_id) if cursor_time is not None and cursor_id is not None else None
         history = edit_service.get_document_edit_history(
             document_id=document_id,
             skip=skip,
-            limit=limit
+            limit=limit,
+            cursor=cursor
         )
         
         # 转换为字典列表，以便更好地序列化
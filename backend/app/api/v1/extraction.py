@@ -5,6 +5,7 @@ import os
 import tempfile
 import json
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
 
 from app.api.deps import get_db_session, get_extraction_service
@@ -63,7 +64,7 @@ def get_extraction(
         # 如果指定了xlsx格式，则返回Excel文件
         if format == 'xlsx':
             # 获取文档信息
-            document = db.query(Document).filter(Document.id == document_id).first()
+            document = db.get(Document, document_id)
             if not document:
                 raise HTTPException(status_code=404, detail=f"文档ID {document_id} 不存在")
             
@@ -142,8 +143,8 @@ async def test_extraction(
             contents = await file.read()
             buffer.write(contents)
         
-        # 使用LLMExtractor处理文档
-        results = extraction_service.process_document(temp_file_path)
+        # 使用LLMExtractor处理文档（耗时的同步处理放到线程池中执行，避免阻塞事件循环中的其他请求）
+        results = await run_in_threadpool(extraction_service.process_document, temp_file_path)
         
         # 格式化结果
         structured_info = extraction_service.format_output(results)
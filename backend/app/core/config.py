@@ -51,6 +51,9 @@ class Settings(BaseSettings):
     LLM_SERVER_IP: str = "ip"
     LLM_SERVER_PORT: str = "port"
     LLM_SERVER_MODEL: str = "deepseek-r1:32b"
+    LLM_JSON_MODE: bool = False  # 模型是否支持JSON输出模式（response_format / format=json）
+    LLM_PROMPT_CACHE: bool = False  # 云API是否支持prompt_cache_key，用于提高共享前缀的缓存命中率
+    LLM_CACHE_DIR: Optional[str] = None  # LLM响应磁盘缓存目录，为空时只使用内存缓存
     
     model_config = ConfigDict(case_sensitive=True, env_file=".env")
 
@@ -1,17 +1,39 @@
+import json
+
+try:
+    # orjson序列化/解析速度明显快于标准库json，未安装时回退到标准库
+    import orjson
+except ImportError:
+    orjson = None
+
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from ..core.config import settings
 
+
+def _json_serializer(obj) -> str:
+    """JSON列的序列化函数，中文按原样存储，不转义为\\uXXXX，减少存储体积"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+
+_json_deserializer = orjson.loads if orjson is not None else json.loads
+
 # 创建数据库引擎
 engine = create_engine(
     settings.SQLALCHEMY_DATABASE_URI,
     pool_pre_ping=True,
+    json_serializer=_json_serializer,
+    json_deserializer=_json_deserializer,
 )
 
 # 创建会话工厂
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 提交后不使对象过期：对象的值都已在应用中设置（默认值在Python端生成、主键在插入时回填），
+# 无需在提交后refresh或在访问属性时再次查询数据库
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # 获取数据库会话
 def get_db():
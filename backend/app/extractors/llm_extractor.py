@@ -17,6 +17,13 @@ import sys
 from .llm_service import LLMService
 from .multi_agent.coordinator_agent import CoordinatorAgent
 
+# 模块级日志记录器，处理器只在导入时配置一次
+logger = logging.getLogger("LLMExtractor")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(_handler)
+
 
 class LLMExtractor:
     """
@@ -40,13 +47,8 @@ class LLMExtractor:
         self.debug = debug
         
         # 配置日志
-        self.logger = logging.getLogger("LLMExtractor")
-        if not self.logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-            handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
-            self.logger.setLevel(logging.INFO if not debug else logging.DEBUG)
+        self.logger = logger
+        self.logger.setLevel(logging.INFO if not debug else logging.DEBUG)
         
         self.logger.info("初始化LLMExtractor...")
         
@@ -55,7 +57,19 @@ class LLMExtractor:
         
         self.logger.info("LLMExtractor初始化完成。")
     
-    def extract(self, file_path_or_paths, output_dir=None, output_json=True, output_excel=True, batch=True, max_workers=4, batch_by_group=True):
+    def close(self):
+        """释放协调Agent和底层LLM服务持有的HTTP连接"""
+        self.coordinator.close()
+        self.llm_service.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+    
+    def extract(self, file_path_or_paths, output_dir=None, output_json=True, output_excel=True, batch=True, max_workers=4, batch_by_group=True,
+                force_refresh=False):
         """
         统一的提取方法，可处理单个文件或多个文件
         
@@ -67,6 +81,7 @@ class LLMExtractor:
             batch: 是否使用批量处理方式
             max_workers: 批量处理时的最大并行工作线程数
             batch_by_group: 批量处理时是否按物理状态组进行批处理
+            force_refresh: 是否忽略LLM响应缓存，重新调用API
             
         返回:
             单个文件时：提取的结果列表
@@ -85,7 +100,8 @@ class LLMExtractor:
                 output_excel=output_excel, 
                 batch=batch, 
                 max_workers=max_workers, 
-                batch_by_group=batch_by_group
+                batch_by_group=batch_by_group,
+                force_refresh=force_refresh
             )
             
         # 处理多个文件
@@ -93,7 +109,9 @@ class LLMExtractor:
             self.logger.info(f"批量处理{len(file_path_or_paths)}个文档文件")
             results = {}
                 
-            for file_path in tqdm(file_path_or_paths, desc="处理文档"):
+            # 服务端运行（无终端）时关闭进度条，避免无意义的输出和锁竞争
+            progress = tqdm(file_path_or_paths, desc="处理文档", disable=not sys.stderr.isatty(), mininterval=0.5)
+            for file_path in progress:
                 try:
                     file_result = self.coordinator.process_document(
                         doc_path=file_path, 
@@ -102,7 +120,8 @@ class LLMExtractor:
                         output_excel=output_excel,
                         batch=batch,
                         max_workers=max_workers,
-                        batch_by_group=batch_by_group
+                        batch_by_group=batch_by_group,
+                        force_refresh=force_refresh
                     )
                     results[file_path] = file_result
                 except Exception as e:
@@ -111,19 +130,20 @@ class LLMExtractor:
             
             return results
     
-    def _call_llm_api(self, prompt, max_retries=3, retry_delay=2):
+    def _call_llm_api(self, prompt, max_retries=3, retry_delay=2, response_format=None):
         """调用LLM API（包含重试机制）
         
         参数:
             prompt: 发送给API的提示词
             max_retries: 最大重试次数
             retry_delay: 初始重试延迟（秒）
+            response_format: 期望的响应格式，如{"type": "json_object"}
             
         返回:
             API响应内容，如果失败则返回空字符串
         """
         # 使用LLMService的call_llm方法
-        return self.llm_service.call_llm(prompt, max_retries, retry_delay)
+        return self.llm_service.call_llm(prompt, max_retries, retry_delay, response_format=response_format)
     
     def _extract_json_from_response(self, response, is_array=False):
         """从LLM响应中提取JSON部分
@@ -138,7 +158,8 @@ class LLMExtractor:
         # 使用LLMService的extract_json_from_response方法
         return self.llm_service.extract_json_from_response(response, is_array)
     
-    def extract_from_text(self, text, output_dir=None, output_json=False, output_excel=False, batch=True, max_workers=4, batch_by_group=True, filename='text_extraction'):
+    def extract_from_text(self, text, output_dir=None, output_json=False, output_excel=False, batch=True, max_workers=4, batch_by_group=True, filename='text_extraction',
+                          force_refresh=False):
         """从文本内容中提取信息（无需文档文件）
         
         参数:
@@ -150,6 +171,7 @@ class LLMExtractor:
             max_workers: 批量处理时的最大并行工作线程数
             batch_by_group: 批量处理时是否按物理状态组进行批处理
             filename: 输出文件的基础名称（不含扩展名）
+            force_refresh: 是否忽略LLM响应缓存，重新调用API
             
         返回:
             提取的结果列表
@@ -163,5 +185,6 @@ class LLMExtractor:
             output_excel=output_excel, 
             batch=batch, 
             max_workers=max_workers, 
-            batch_by_group=batch_by_group
+            batch_by_group=batch_by_group,
+            force_refresh=force_refresh
         )
\ No newline at end of file
@@ -1,5 +1,12 @@
+import os
 import json
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 import time
 import random
@@ -7,11 +14,25 @@ import traceback
 import sys
 import re
 
+# 模块级日志记录器，处理器只在导入时配置一次
+logger = logging.getLogger("LLMService")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(_handler)
+
+# 从LLM响应中提取JSON使用的正则，模块加载时编译一次
+_JSON_ARRAY_RE = re.compile(r'(\[\s*\{[\s\S]*\}\s*\])')
+_JSON_OBJECT_RE = re.compile(r'({[\s\S]*})')
+_MARKDOWN_BLOCK_RE = re.compile(r'```(?:json)?\s*([\s\S]*?)```')
+
+
 class LLMService:
     """LLM API服务类，处理与不同LLM API的通信"""
     
     def __init__(self, model_name="gpt-3.5-turbo", server_ip="127.0.0.1", server_port=8000, 
-                 api_key=None, api_base=None, debug=False, use_api=None):
+                 api_key=None, api_base=None, debug=False, use_api=None, json_mode=False,
+                 max_connections=32, prompt_cache=False, cache_dir=None, response_cache_size=1024):
         """
         初始化LLM服务
         
@@ -23,6 +44,11 @@ class LLMService:
             api_base: API基础URL（使用云服务时可自定义，默认根据是否提供API密钥自动选择）
             debug: 是否启用调试模式
             use_api: 是否强制使用API模式，None表示自动判断（有api_key则使用云API）
+            json_mode: 模型是否支持JSON输出模式（response_format），开启后调用方可要求模型直接返回JSON
+            max_connections: 连接池中保持的最大连接数，应不小于并行调用的线程数
+            prompt_cache: 云API是否支持prompt_cache_key参数，开启后共享前缀的请求会被路由到同一缓存
+            cache_dir: LLM响应磁盘缓存目录，为None时只使用内存缓存
+            response_cache_size: 内存中缓存的最大响应条数
         """
         self.server_ip = server_ip
         self.server_port = server_port
@@ -30,6 +56,23 @@ class LLMService:
         self.api_key = api_key
         self.api_base = api_base
         self.debug = debug
+        self.json_mode = json_mode
+        self.prompt_cache = prompt_cache
+        self.max_connections = max_connections
+        
+        # 所有调用共享同一个会话，复用keep-alive连接，避免每次请求重新建立TCP/TLS连接
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # 响应缓存：相同提示词直接复用之前的响应（内存LRU + 可选的磁盘缓存）
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.response_cache_size = response_cache_size
+        self._response_cache = OrderedDict()
+        self._response_cache_lock = threading.Lock()
         
         # 根据use_api参数和api_key决定使用何种API调用方式
         if use_api is not None:
@@ -43,13 +86,8 @@ class LLMService:
             self.use_cloud_api = self.api_key is not None
         
         # 配置日志
-        self.logger = logging.getLogger("LLMService")
-        if not self.logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-            handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
-            self.logger.setLevel(logging.INFO if not debug else logging.DEBUG)
+        self.logger = logger
+        self.logger.setLevel(logging.INFO if not debug else logging.DEBUG)
         
         self.logger.info("初始化LLMService...")
         if self.use_cloud_api:
@@ -57,29 +95,14 @@ class LLMService:
         else:
             self.logger.info(f"使用本地API模式，服务器: {self.server_ip}:{self.server_port}")
     
-    def call_llm(self, prompt, max_retries=3, retry_delay=2):
-        """调用LLM API（包含重试机制）
-        
-        参数:
-            prompt: 发送给API的提示词
-            max_retries: 最大重试次数
-            retry_delay: 初始重试延迟（秒）
-            
-        返回:
-            API响应内容，如果失败则返回空字符串
-        """
-        # 生成请求ID用于保存中间结果
-        request_id = f"api_call_{int(time.time())}_{random.randint(1000, 9999)}"
-        
-        # 保存请求信息
-        if hasattr(self, 'intermediate_dir'):
-            self._save_intermediate_result(request_id, {
-                "prompt": prompt,
-                "max_retries": max_retries,
-                "retry_delay": retry_delay
-            })
+    def _build_request(self, prompt, response_format=None, cache_key=None, system_prompt=None):
+        """构建API请求的URL、请求头和请求体"""
+        # 系统提示单独作为system消息，保证同一文档的请求拥有完全相同的消息前缀
+        messages = [{'role': 'user', 'content': prompt}]
+        if system_prompt:
+            messages.insert(0, {'role': 'system', 'content': system_prompt})
         
-        # 根据是否使用云API决定调用方式
+        # 根据是否使用云API决定请求方式
         if self.use_cloud_api:
             # 使用云API（如OpenAI的API）
             if self.api_base:
@@ -95,19 +118,70 @@ class LLMService:
             
             data = {
                 'model': self.model_name,
-                'messages': [{'role': 'user', 'content': prompt}],
+                'messages': messages,
                 'temperature': 0.01,
             }
+            if response_format and self.json_mode:
+                data['response_format'] = response_format
+            if cache_key and self.prompt_cache:
+                data['prompt_cache_key'] = cache_key
         else:
             # 使用本地API服务器
             url = f'http://{self.server_ip}:{self.server_port}/api/chat'
             headers = {'Content-Type': 'application/json'}
             data = {
                 'model': self.model_name,
-                'messages': [{'role': 'user', 'content': prompt}],
+                'messages': messages,
                 'options': {'temperature': 0.01},
                 'stream': True
             }
+            if response_format and self.json_mode:
+                # 本地服务器（Ollama）使用format字段约束JSON输出
+                data['format'] = 'json'
+        
+        return url, headers, data
+    
+    def _retry_delay(self, attempt, retry_delay):
+        """计算第attempt次重试前的延迟（指数退避 + 随机抖动）"""
+        jitter = random.uniform(0, 1)
+        return retry_delay * (1.5 ** (attempt - 1)) + jitter
+    
+    def _parse_cloud_response(self, response_json):
+        """从标准OpenAI格式响应中提取内容"""
+        if 'choices' in response_json and len(response_json['choices']) > 0:
+            return response_json['choices'][0]['message']['content']
+        self.logger.warning(f"无法从API响应中解析内容: {response_json}")
+        return ""
+    
+    def call_llm(self, prompt, max_retries=3, retry_delay=2, response_format=None, cache_key=None,
+                 system_prompt=None):
+        """调用LLM API（包含重试机制）
+        
+        参数:
+            prompt: 发送给API的提示词
+            max_retries: 最大重试次数
+            retry_delay: 初始重试延迟（秒）
+            response_format: 期望的响应格式，如{"type": "json_object"}；仅在json_mode开启时生效
+            cache_key: 共享提示前缀的缓存键；仅在prompt_cache开启时发送给云API
+            system_prompt: 可选的系统提示，作为system消息放在用户消息之前
+            
+        返回:
+            API响应内容，如果失败则返回空字符串
+        """
+        # 生成请求ID用于保存中间结果
+        request_id = f"api_call_{int(time.time())}_{random.randint(1000, 9999)}"
+        
+        # 保存请求信息
+        if hasattr(self, 'intermediate_dir'):
+            self._save_intermediate_result(request_id, {
+                "system_prompt": system_prompt,
+                "prompt": prompt,
+                "max_retries": max_retries,
+                "retry_delay": retry_delay
+            })
+        
+        # 构建请求
+        url, headers, data = self._build_request(prompt, response_format, cache_key, system_prompt)
         
         if self.debug:
             self.logger.debug(f"API请求: {url}")
@@ -118,8 +192,7 @@ class LLMService:
             try:
                 # 添加随机短延迟，避免大量请求同时发送
                 if attempt > 0:  # 仅在重试时添加延迟
-                    jitter = random.uniform(0, 1)
-                    current_delay = retry_delay * (1.5 ** (attempt - 1)) + jitter
+                    current_delay = self._retry_delay(attempt, retry_delay)
                     self.logger.warning(f"第{attempt+1}次重试，延迟{current_delay:.2f}秒...")
                     time.sleep(current_delay)
                 
@@ -129,20 +202,13 @@ class LLMService:
                 # 根据API类型执行不同的调用逻辑
                 if self.use_cloud_api:
                     # 调用云API
-                    response = requests.post(url, headers=headers, json=data)
+                    response = self.session.post(url, headers=headers, json=data)
                     response.raise_for_status()
-                    response_json = response.json()
-                    
-                    # 从标准OpenAI格式响应中提取内容
-                    if 'choices' in response_json and len(response_json['choices']) > 0:
-                        content = response_json['choices'][0]['message']['content']
-                    else:
-                        self.logger.warning(f"无法从API响应中解析内容: {response_json}")
-                        content = ""
+                    content = self._parse_cloud_response(response.json())
                 else:
                     # 使用本地服务器（流式响应）
                     content = ""
-                    with requests.post(url, headers=headers, json=data, stream=True) as response:
+                    with self.session.post(url, headers=headers, json=data, stream=True) as response:
                         response.raise_for_status()
                         
                         for line in response.iter_lines(decode_unicode=True):
@@ -190,18 +256,189 @@ class LLMService:
         # 所有重试都失败
         return ""
     
-    def extract_json_from_response(self, response, is_array=False):
+    def create_async_session(self, max_connections=None, keepalive_timeout=60):
+        """创建异步HTTP会话，同一会话内的并发请求共享连接池
+        
+        参数:
+            max_connections: 最大并发连接数，默认与同步连接池大小一致
+            keepalive_timeout: 空闲连接保持时间（秒）；会话跨文档复用，较长的保持时间可避免处理下一个文档时重新握手
+            
+        返回:
+            aiohttp.ClientSession实例，需在事件循环中使用并在结束后关闭
+        """
+        connector = aiohttp.TCPConnector(
+            limit=max_connections or self.max_connections,
+            keepalive_timeout=keepalive_timeout,
+        )
+        return aiohttp.ClientSession(connector=connector)
+    
+    async def acall_llm(self, session, prompt, max_retries=3, retry_delay=2, response_format=None, cache_key=None,
+                        system_prompt=None):
+        """异步调用LLM API（包含重试机制），参数与call_llm相同
+        
+        参数:
+            session: create_async_session创建的aiohttp会话
+            prompt: 发送给API的提示词
+            
+        返回:
+            API响应内容，如果失败则返回空字符串
+        """
+        url, headers, data = self._build_request(prompt, response_format, cache_key, system_prompt)
+        
+        for attempt in range(max_retries):
+            try:
+                if attempt > 0:
+                    current_delay = self._retry_delay(attempt, retry_delay)
+                    self.logger.warning(f"第{attempt+1}次重试，延迟{current_delay:.2f}秒...")
+                    await asyncio.sleep(current_delay)
+                
+                start_time = time.time()
+                
+                if self.use_cloud_api:
+                    async with session.post(url, headers=headers, json=data) as response:
+                        response.raise_for_status()
+                        content = self._parse_cloud_response(await response.json(content_type=None))
+                else:
+                    # 本地服务器按行返回流式JSON
+                    content = ""
+                    async with session.post(url, headers=headers, json=data) as response:
+                        response.raise_for_status()
+                        async for line in response.content:
+                            line = line.strip()
+                            if line:
+                                try:
+                                    content += json.loads(line)['message']['content']
+                                except json.JSONDecodeError:
+                                    continue
+                
+                response_time = time.time() - start_time
+                
+                if not content:
+                    self.logger.warning(f"API返回空响应，尝试重试 ({attempt+1}/{max_retries})")
+                    continue
+                
+                self.logger.debug(f"API调用成功，耗时: {response_time:.2f}秒")
+                return content
+            
+            except Exception as e:
+                if attempt < max_retries - 1:
+                    self.logger.warning(f"API调用失败，将重试 ({attempt+1}/{max_retries}): {str(e)}")
+                else:
+                    self.logger.error(f"API调用在{max_retries}次尝试后失败: {str(e)}")
+        
+        # 所有重试都失败
+        return ""
+    
+    def _response_cache_key(self, prompt, response_format=None, system_prompt=None):
+        """根据模型名称、响应格式、系统提示和提示词生成响应缓存键"""
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(self.model_name.encode('utf-8'))
+        hasher.update(json.dumps(response_format, sort_keys=True).encode('utf-8'))
+        if system_prompt:
+            hasher.update(system_prompt.encode('utf-8'))
+            hasher.update(b'\0')
+        hasher.update(prompt.encode('utf-8'))
+        return hasher.hexdigest()
+    
+    def _get_cached_response(self, key):
+        """读取缓存的响应，先查内存再查磁盘，未命中时返回None"""
+        with self._response_cache_lock:
+            if key in self._response_cache:
+                self._response_cache.move_to_end(key)
+                return self._response_cache[key]
+        
+        if self.cache_dir:
+            cache_path = os.path.join(self.cache_dir, f"{key}.txt")
+            if os.path.exists(cache_path):
+                try:
+                    with open(cache_path, 'r', encoding='utf-8') as f:
+                        content = f.read()
+                    self._set_cached_response(key, content, persist=False)
+                    return content
+                except Exception as e:
+                    self.logger.warning(f"读取LLM响应缓存失败: {str(e)}")
+        return None
+    
+    def _set_cached_response(self, key, content, persist=True):
+        """写入响应缓存，persist为True时同时写入磁盘"""
+        with self._response_cache_lock:
+            self._response_cache[key] = content
+            self._response_cache.move_to_end(key)
+            while len(self._response_cache) > self.response_cache_size:
+                self._response_cache.popitem(last=False)
+        
+        if persist and self.cache_dir:
+            try:
+                with open(os.path.join(self.cache_dir, f"{key}.txt"), 'w', encoding='utf-8') as f:
+                    f.write(content)
+            except Exception as e:
+                self.logger.warning(f"写入LLM响应缓存失败: {str(e)}")
+    
+    def call_llm_cached(self, prompt, force_refresh=False, **kwargs):
+        """带响应缓存的call_llm，相同提示词不会重复调用API
+        
+        参数:
+            prompt: 发送给API的提示词
+            force_refresh: 是否忽略已有缓存并重新调用API（新的响应仍会写入缓存）
+            **kwargs: 传递给call_llm的其他参数
+            
+        返回:
+            API响应内容，如果失败则返回空字符串
+        """
+        key = self._response_cache_key(prompt, kwargs.get('response_format'), kwargs.get('system_prompt'))
+        if not force_refresh:
+            content = self._get_cached_response(key)
+            if content is not None:
+                self.logger.debug(f"命中LLM响应缓存: {key}")
+                return content
+        
+        content = self.call_llm(prompt, **kwargs)
+        # 只缓存成功的响应，失败的请求下次仍会重试
+        if content:
+            self._set_cached_response(key, content)
+        return content
+    
+    async def acall_llm_cached(self, session, prompt, force_refresh=False, **kwargs):
+        """带响应缓存的acall_llm，参数与call_llm_cached相同"""
+        key = self._response_cache_key(prompt, kwargs.get('response_format'), kwargs.get('system_prompt'))
+        if not force_refresh:
+            content = self._get_cached_response(key)
+            if content is not None:
+                self.logger.debug(f"命中LLM响应缓存: {key}")
+                return content
+        
+        content = await self.acall_llm(session, prompt, **kwargs)
+        if content:
+            self._set_cached_response(key, content)
+        return content
+    
+    def close(self):
+        """关闭HTTP会话，释放连接池中的连接"""
+        self.session.close()
+    
+    def extract_json_from_response(self, response, is_array=False, _fallback=True):
         """从LLM响应中提取JSON部分
         
         参数:
             response: LLM的响应文本
             is_array: 是否需要提取JSON数组（默认为False，提取单个JSON对象）
+            _fallback: 内部参数，是否允许回退到另一种类型的提取（避免相互递归）
             
         返回:
             提取出的JSON字符串，如果无法提取则返回空字符串
         """
         if not response:
             return ""
+        
+        # 快速路径：JSON模式下响应本身就是合法JSON，无需正则扫描
+        stripped = response.strip()
+        if stripped[:1] in ('{', '['):
+            try:
+                parsed = json.loads(stripped)
+                if isinstance(parsed, list if is_array else dict):
+                    return stripped
+            except ValueError:
+                pass
             
         # 记录原始响应以便调试
         if len(response) > 1000:
@@ -209,16 +446,19 @@ class LLMService:
         else:
             self.logger.debug(f"提取JSON前的响应: {response}")
         
+        # 记录已尝试解析的候选字符串，避免对同一段文本重复调用json.loads
+        tried = set()
+        
         # 首先尝试提取指定类型的JSON
         if is_array:
             # 提取JSON数组
             
-            # 方法1: 寻找数组格式的JSON
-            array_regex = r'(\[\s*\{[\s\S]*\}\s*\])'
-            array_matches = re.findall(array_regex, response)
+            # 方法1: 寻找数组格式的JSON（响应中没有方括号时无需扫描）
+            array_matches = _JSON_ARRAY_RE.findall(response) if '[' in response else []
             
             if array_matches:
                 for potential_array in array_matches:
+                    tried.add(potential_array)
                     try:
                         # 验证是否为有效JSON数组
                         json.loads(potential_array)
@@ -227,15 +467,18 @@ class LLMService:
                         continue
             
             # 方法2: 寻找Markdown代码块中的JSON数组
-            markdown_regex = r'```(?:json)?\s*([\s\S]*?)```'
-            markdown_matches = re.findall(markdown_regex, response)
+            markdown_matches = _MARKDOWN_BLOCK_RE.findall(response) if '```' in response else []
             
             if markdown_matches:
                 for potential_json in markdown_matches:
                     # 在代码块中查找JSON数组
-                    array_in_block = re.findall(r'(\[\s*\{[\s\S]*\}\s*\])', potential_json)
+                    array_in_block = _JSON_ARRAY_RE.findall(potential_json)
                     if array_in_block:
                         for array_json in array_in_block:
+                            # 跳过已经验证失败的候选
+                            if array_json in tried:
+                                continue
+                            tried.add(array_json)
                             try:
                                 # 验证是否为有效JSON数组
                                 json.loads(array_json)
@@ -248,7 +491,9 @@ class LLMService:
                 start_idx = response.find('[')
                 end_idx = response.rfind(']')
                 
-                if start_idx != -1 and end_idx != -1 and start_idx < end_idx:
+                # 与前面的候选相同则无需重复解析
+                if start_idx != -1 and end_idx != -1 and start_idx < end_idx \
+                        and response[start_idx:end_idx+1] not in tried:
                     array_str = response[start_idx:end_idx+1]
                     try:
                         # 验证是否为有效JSON数组
@@ -259,7 +504,7 @@ class LLMService:
                         pass
             
             # 如果优先提取数组但未成功，尝试提取单个对象并包装成数组
-            obj_json = self.extract_json_from_response(response, is_array=False)
+            obj_json = self.extract_json_from_response(response, is_array=False, _fallback=False) if _fallback else ""
             if obj_json:
                 try:
                     # 验证是否为有效JSON对象
@@ -273,12 +518,14 @@ class LLMService:
         else:
             # 提取单个JSON对象
             
-            # 方法1: 寻找JSON对象
-            json_regex = r'({[\s\S]*})'
-            json_matches = re.findall(json_regex, response)
+            # 方法1: 寻找JSON对象（响应中没有花括号时无需扫描）
+            # 按长度降序尝试，最外层的对象通常就是目标结果
+            json_matches = sorted(_JSON_OBJECT_RE.findall(response), key=len, reverse=True) \
+                if '{' in response else []
             
             if json_matches:
                 for potential_json in json_matches:
+                    tried.add(potential_json)
                     try:
                         # 验证是否为有效JSON
                         json.loads(potential_json)
@@ -287,8 +534,7 @@ class LLMService:
                         continue
             
             # 方法2: 寻找Markdown代码块中的JSON
-            markdown_regex = r'```(?:json)?\s*([\s\S]*?)```'
-            markdown_matches = re.findall(markdown_regex, response)
+            markdown_matches = _MARKDOWN_BLOCK_RE.findall(response) if '```' in response else []
             
             if markdown_matches:
                 for potential_json in markdown_matches:
@@ -299,6 +545,10 @@ class LLMService:
                         
                         if start_idx != -1 and end_idx != -1:
                             json_str = potential_json[start_idx:end_idx+1]
+                            # 每个候选只解析一次
+                            if json_str in tried:
+                                continue
+                            tried.add(json_str)
                             # 验证是否为有效JSON
                             json.loads(json_str)
                             return json_str
@@ -310,7 +560,9 @@ class LLMService:
                 start_idx = response.find('{')
                 end_idx = response.rfind('}')
                 
-                if start_idx != -1 and end_idx != -1 and start_idx < end_idx:
+                # 与前面的候选相同则无需重复解析
+                if start_idx != -1 and end_idx != -1 and start_idx < end_idx \
+                        and response[start_idx:end_idx+1] not in tried:
                     json_str = response[start_idx:end_idx+1]
                     try:
                         # 验证是否为有效JSON
@@ -320,8 +572,8 @@ class LLMService:
                         pass
                         
             # 如果优先提取对象但未成功，尝试从数组中提取第一个对象
-            if not is_array:  # 避免无限递归
-                array_json = self.extract_json_from_response(response, is_array=True)
+            if _fallback:  # 避免无限递归
+                array_json = self.extract_json_from_response(response, is_array=True, _fallback=False)
                 if array_json:
                     try:
                         # 尝试解析数组并返回第一个对象
@@ -0,0 +1,27 @@
+"""
+Multi-Agent架构共用的日志配置
+
+所有Agent共享同一个StreamHandler和Formatter，只在模块导入时创建一次
+"""
+
+import logging
+
+_HANDLER = logging.StreamHandler()
+_HANDLER.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+
+def get_logger(name):
+    """
+    获取Agent使用的模块级日志记录器，处理器只添加一次
+
+    参数:
+        name: 日志记录器名称
+
+    返回:
+        配置好的logging.Logger实例，日志级别由Agent初始化时按debug参数设置
+    """
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        logger.addHandler(_HANDLER)
+        logger.setLevel(logging.INFO)
+    return logger
@@ -1,12 +1,85 @@
 import json
 import logging
 import os
-from docx import Document
-import pandas as pd
+import zipfile
+import concurrent.futures
+from lxml import etree
+import xlsxwriter
 
 from .extraction_agent import ExtractionAgent
 from .identification_agent import IdentificationAgent
 from .validation_agent import ValidationAgent
+from ._logging import get_logger
+
+try:
+    # orjson序列化速度明显快于标准库json，未安装时回退到标准库
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_BODY = f'{_W_NS}body'
+_W_P = f'{_W_NS}p'
+_W_TBL = f'{_W_NS}tbl'
+_W_R = f'{_W_NS}r'
+_W_HYPERLINK = f'{_W_NS}hyperlink'
+_W_RUN_TEXT = {f'{_W_NS}t': None, f'{_W_NS}tab': '\t', f'{_W_NS}br': '\n', f'{_W_NS}cr': '\n'}
+
+
+def _paragraph_text(p_elem):
+    """
+    拼接段落自身文本：只读取段落直接包含的run（及超链接中的run）的直接子节点，
+    与python-docx的Paragraph.text一致；run中w:drawing、w:pict、mc:AlternateContent
+    下的文本框内容不属于该段落，不会被读取（Word对同一文本框会同时保存两份）
+    """
+    parts = []
+    for child in p_elem:
+        if child.tag == _W_R:
+            runs = (child,)
+        elif child.tag == _W_HYPERLINK:
+            runs = child.iterchildren(_W_R)
+        else:
+            continue
+        for run in runs:
+            for node in run:
+                if node.tag in _W_RUN_TEXT:
+                    text = _W_RUN_TEXT[node.tag]
+                    parts.append((node.text or '') if text is None else text)
+    return ''.join(parts)
+
+
+def _read_docx_streaming(path):
+    """
+    流式读取docx文档正文中的段落文本
+
+    直接用iterparse解析word/document.xml，每处理完一个正文元素就释放它，
+    不构建完整的文档对象树。与python-docx的doc.paragraphs一致，只返回正文
+    顶层段落（不包含表格中的段落）。
+
+    参数:
+        path: docx文档路径
+
+    返回:
+        逐段产出段落文本的生成器
+    """
+    with zipfile.ZipFile(path) as docx_zip, docx_zip.open('word/document.xml') as stream:
+        for _, elem in etree.iterparse(stream, events=('end',), tag=(_W_P, _W_TBL)):
+            parent = elem.getparent()
+            if parent is None or parent.tag != _W_BODY:
+                continue
+
+            if elem.tag == _W_P:
+                yield _paragraph_text(elem)
+
+            # 释放已处理的元素及其之前的兄弟节点，保持内存占用稳定
+            elem.clear()
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+# 模块级日志记录器，处理器只在导入时配置一次
+logger = get_logger("CoordinatorAgent")
 
 
 class CoordinatorAgent:
@@ -33,13 +106,8 @@ class CoordinatorAgent:
         self.debug = debug
 
         # 配置日志
-        self.logger = logging.getLogger("CoordinatorAgent")
-        if not self.logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-            handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
-            self.logger.setLevel(logging.INFO if not debug else logging.DEBUG)
+        self.logger = logger
+        self.logger.setLevel(logging.INFO if not debug else logging.DEBUG)
 
         self.logger.info("初始化CoordinatorAgent...")
 
@@ -50,8 +118,12 @@ class CoordinatorAgent:
 
         self.logger.info("CoordinatorAgent初始化完成。")
 
+    def close(self):
+        """释放提取Agent持有的后台事件循环和HTTP连接"""
+        self.extraction_agent.close()
+
     def process_document(self, doc_path=None, doc_text=None, output_dir=None, output_json=True, output_excel=True,
-                         batch=True, max_workers=4, batch_by_group=True):
+                         batch=True, max_workers=4, batch_by_group=True, force_refresh=False):
         """
         处理文档，提取物理状态信息
 
@@ -64,6 +136,7 @@ class CoordinatorAgent:
             batch: 是否使用批量处理模式
             max_workers: 批量处理的最大线程数
             batch_by_group: 批量处理时是否按物理状态组分组
+            force_refresh: 是否忽略LLM响应缓存，重新调用API
 
         返回:
             提取的结果列表
@@ -72,8 +145,7 @@ class CoordinatorAgent:
         if doc_path:
             self.logger.info(f"正在读取文档: {doc_path}")
             try:
-                doc = Document(doc_path)
-                text = '\n'.join([paragraph.text for paragraph in doc.paragraphs])
+                text = '\n'.join(_read_docx_streaming(doc_path))
 
                 # 检查文档是否为空
                 if not text.strip():
@@ -97,22 +169,30 @@ class CoordinatorAgent:
 
         # 阶段1: 识别物理状态组和物理状态 - 使用识别Agent
         self.logger.info("阶段1: 正在识别文档中的物理状态组和物理状态...")
-        identified_states = self.identification_agent.identify_groups_and_states(text)
-
-        # 阶段2: 提取具体值 - 使用提取Agent
-        self.logger.info("阶段2: 正在提取具体的物理状态值...")
-        extraction_results = self.extraction_agent.extract_specific_values(
-            text,
-            identified_states,
-            parallel=True,
-            max_workers=max_workers,
-            batch=batch,
-            batch_by_group=batch_by_group
-        )
-
-        # 阶段3: 验证和优化结果 - 使用验证Agent
-        self.logger.info("阶段3: 正在验证和优化提取结果...")
-        validated_results = self.validation_agent.validate_extraction_results(text, extraction_results)
+        identified_states = self.identification_agent.identify_groups_and_states(text, force_refresh=force_refresh)
+
+        # 阶段2和阶段3: 提取具体值 - 使用提取Agent；验证和优化结果 - 使用验证Agent
+        if batch and batch_by_group:
+            # 按组批处理时各批次的物理状态组互不重叠，每个批次提取完成后立即提交验证，
+            # 使验证与剩余批次的提取重叠执行
+            self.logger.info("阶段2/3: 正在流水线式地提取和验证物理状态值...")
+            validated_results = self._extract_and_validate_pipelined(
+                text, identified_states, max_workers, force_refresh)
+        else:
+            self.logger.info("阶段2: 正在提取具体的物理状态值...")
+            extraction_results = self.extraction_agent.extract_specific_values(
+                text,
+                identified_states,
+                parallel=True,
+                max_workers=max_workers,
+                batch=batch,
+                batch_by_group=batch_by_group,
+                force_refresh=force_refresh
+            )
+
+            self.logger.info("阶段3: 正在验证和优化提取结果...")
+            validated_results = self.validation_agent.validate_extraction_results(
+                text, extraction_results, max_workers=max_workers, force_refresh=force_refresh)
 
         # 结果保存
         if doc_path and (output_json or output_excel) and validated_results:
@@ -128,29 +208,94 @@ class CoordinatorAgent:
                 name_without_ext = os.path.splitext(os.path.basename(doc_path))[0]
                 output_base = os.path.join(doc_dir, name_without_ext)
 
-            # 输出JSON文件
-            if output_json:
-                json_path = f"{output_base}_extraction.json"
-                try:
-                    with open(json_path, 'w', encoding='utf-8') as f:
-                        json.dump(validated_results, f, ensure_ascii=False, indent=2)
-                    self.logger.info(f"已保存JSON结果到: {json_path}")
-                except Exception as e:
-                    self.logger.error(f"保存JSON结果失败: {str(e)}")
-
-            # 输出Excel文件
-            if output_excel:
-                excel_path = f"{output_base}_extraction.xlsx"
-                try:
-                    # 将结果转换为DataFrame
-                    df = pd.DataFrame(validated_results)
-
-                    # 保存为Excel
-                    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                        df.to_excel(writer, index=False, sheet_name='提取结果')
-
-                    self.logger.info(f"已保存Excel结果到: {excel_path}")
-                except Exception as e:
-                    self.logger.error(f"保存Excel结果失败: {str(e)}")
-
-        return validated_results
\ No newline at end of file
+            # JSON和Excel写入不同文件，互不依赖，并行写入
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                futures = []
+                if output_json:
+                    futures.append(executor.submit(
+                        self._save_json_results, validated_results, f"{output_base}_extraction.json"))
+                if output_excel:
+                    futures.append(executor.submit(
+                        self._save_excel_results, validated_results, f"{output_base}_extraction.xlsx"))
+                concurrent.futures.wait(futures)
+
+        return validated_results
+
+    def _extract_and_validate_pipelined(self, text, identified_states, max_workers, force_refresh=False):
+        """
+        按组批处理提取，并在每个批次提取完成后立即在线程池中验证该批次的结果
+
+        参数:
+            text: 文档文本内容
+            identified_states: 识别出的物理状态组合列表
+            max_workers: 最大并行数（同时用于提取请求和验证线程）
+            force_refresh: 是否忽略LLM响应缓存
+
+        返回:
+            验证后的结果列表，按批次顺序排列
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # 以批次序号为键，便于最后按批次顺序汇总（批次完成的先后顺序不确定）
+            validation_futures = {}
+
+            def submit_validation(index, batch_results):
+                if batch_results:
+                    validation_futures[index] = executor.submit(
+                        self.validation_agent.validate_extraction_results, text, batch_results,
+                        force_refresh=force_refresh)
+
+            # 各批次的结果已在回调中提交验证，这里只需等待提取全部完成
+            self.extraction_agent.extract_specific_values(
+                text,
+                identified_states,
+                parallel=True,
+                max_workers=max_workers,
+                batch=True,
+                batch_by_group=True,
+                force_refresh=force_refresh,
+                on_batch_done=submit_validation
+            )
+
+            validated_results = []
+            for index in sorted(validation_futures):
+                validated_results.extend(validation_futures[index].result())
+
+        self.logger.info(f"验证和优化完成，最终结果包含{len(validated_results)}个项目")
+        return validated_results
+
+    def _save_json_results(self, results, json_path):
+        """将提取结果保存为JSON文件"""
+        try:
+            if orjson is not None:
+                with open(json_path, 'wb') as f:
+                    f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            else:
+                with open(json_path, 'w', encoding='utf-8') as f:
+                    json.dump(results, f, ensure_ascii=False, indent=2)
+            self.logger.info(f"已保存JSON结果到: {json_path}")
+        except Exception as e:
+            self.logger.error(f"保存JSON结果失败: {str(e)}")
+
+    def _save_excel_results(self, results, excel_path):
+        """将提取结果保存为Excel文件"""
+        try:
+            # 表头为所有结果字段的并集，按首次出现的顺序排列
+            headers = list(dict.fromkeys(key for row in results for key in row))
+
+            # constant_memory模式下逐行写入后即刷新到磁盘，内存占用与结果数量无关
+            workbook = xlsxwriter.Workbook(excel_path, {'constant_memory': True})
+            try:
+                worksheet = workbook.add_worksheet('提取结果')
+                worksheet.write_row(0, 0, headers)
+                for row_index, row in enumerate(results, 1):
+                    for col_index, key in enumerate(headers):
+                        value = row.get(key)
+                        if value is not None and not isinstance(value, (str, int, float, bool)):
+                            value = str(value)
+                        worksheet.write(row_index, col_index, value)
+            finally:
+                workbook.close()
+
+            self.logger.info(f"已保存Excel结果到: {excel_path}")
+        except Exception as e:
+            self.logger.error(f"保存Excel结果失败: {str(e)}")
@@ -1,9 +1,103 @@
+import re
 import json
+import asyncio
+import hashlib
 import logging
-import concurrent.futures
+import functools
+import threading
 
 from ..llm_service import LLMService
-from .prompts import EXTRACTION_GUIDELINES, EXTRACTION_SINGLE_PROMPT, EXTRACTION_BATCH_PROMPT
+from .prompts import EXTRACTION_GUIDELINES, EXTRACTION_CONTEXT_PREFIX, EXTRACTION_SINGLE_PROMPT, EXTRACTION_BATCH_PROMPT, \
+    EXTRACTION_MULTIGROUP_PROMPT
+from ._logging import get_logger
+
+try:
+    # orjson解析速度明显快于标准库json，未安装时回退到标准库
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+
+# 每个提取结果必须包含的字段（元组保留字段顺序，frozenset用于快速求差集）
+_RESULT_KEYS = ("物理状态组", "物理状态", "试验项目", "物理状态值", "风险评价", "测试评语")
+_EXPECTED_KEYS = frozenset(_RESULT_KEYS)
+# 提取结果缺少字段时填充的默认值（物理状态组和物理状态使用请求中的值）
+_DEFAULT_VALUES = {
+    "试验项目": "文档中未包含此信息",
+    "物理状态值": "文中未提及",
+    "风险评价": "文档中未包含此信息",
+    "测试评语": "文档中未包含此信息",
+}
+# 未提取到的物理状态使用的默认项目字段（物理状态组和物理状态按请求填写）
+_DEFAULT_TEMPLATE = {
+    "试验项目": "文中未提及",
+    "物理状态值": "文中未提及",
+    "风险评价": "可用",  # 默认风险评价
+    "测试评语": "文档中未包含此信息",
+}
+
+# 预先把提取规则渲染进共享前缀模板，每次请求只需拼接文档文本
+_CONTEXT_PREFIX_HEAD, _CONTEXT_PREFIX_TAIL = EXTRACTION_CONTEXT_PREFIX.replace(
+    '{EXTRACTION_GUIDELINES}', EXTRACTION_GUIDELINES).split('{text}')
+# 共享前缀中除文档文本外的固定长度，用于在拼接提示前检查长度
+_CONTEXT_PREFIX_OVERHEAD = len(_CONTEXT_PREFIX_HEAD) + len(_CONTEXT_PREFIX_TAIL)
+
+# 扫描JSON顶层结构时关心的记号：完整的字符串（跳过其中的括号）或括号
+_JSON_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{}]')
+# 结果数组的起始位置：方括号后紧跟对象
+_JSON_ARRAY_START_RE = re.compile(r'\[\s*\{')
+
+
+def _scan_top_level(text, expected_type):
+    """
+    单次线性扫描，定位响应中第一个完整的顶层JSON数组（元素为对象）或对象
+
+    返回:
+        (起始位置, 结束位置)；括号不配对或找不到起始位置时返回None
+    """
+    if expected_type is list:
+        match = _JSON_ARRAY_START_RE.search(text)
+        start = match.start() if match else -1
+    else:
+        start = text.find('{')
+    if start == -1:
+        return None
+
+    depth = 0
+    for token in _JSON_TOKEN_RE.finditer(text, start):
+        char = token.group()[0]
+        if char == '"':
+            continue
+        depth += 1 if char in '[{' else -1
+        if depth == 0:
+            return start, token.end()
+    return None
+
+
+@functools.lru_cache(maxsize=8)
+def _context_prefix(text):
+    """构建文档的共享提示前缀及其缓存键，同一文档的所有请求只计算一次"""
+    prefix = ''.join((_CONTEXT_PREFIX_HEAD, text, _CONTEXT_PREFIX_TAIL))
+    return prefix, hashlib.md5(prefix.encode('utf-8')).hexdigest()
+
+
+@functools.lru_cache(maxsize=512)
+def _single_task_prompt(group, state):
+    """生成单个物理状态组合的任务部分提示，同一组合（如处理多个文档或重试时）直接复用"""
+    return EXTRACTION_SINGLE_PROMPT.format(group=group, state=state)
+
+
+@functools.lru_cache(maxsize=256)
+def _batch_task_prompt(group, state_names):
+    """生成按组批处理的任务部分提示，相同的组和状态列表（如重试时）直接复用"""
+    # 每个状态准备一个简单的描述
+    states_str = "\n".join(f"- {state}" for state in state_names)
+    return EXTRACTION_BATCH_PROMPT.format(group=group, states_str=states_str)
+
+
+# 模块级日志记录器，处理器只在导入时配置一次
+logger = get_logger("ExtractionAgent")
 
 
 class ExtractionAgent:
@@ -28,26 +122,53 @@ class ExtractionAgent:
         self.llm_service = llm_service
         self.debug = debug
         self.max_text_length = 20000  # 根据模型能力调整，避免超过模型的token限制
+        self.multigroup_states_budget = 1000  # 按组批处理时，合并到同一请求的各组状态列表总长度上限
+        self.items_per_request = 5  # 非批处理模式下每个请求包含的物理状态组合数，为1时逐项请求
+        
+        # 后台事件循环和异步HTTP会话，在首次并行处理时创建并跨文档复用，保持keep-alive连接
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        self._async_session = None
         
         # 配置日志
-        self.logger = self._setup_logger(debug)
+        self.logger = logger
+        self.logger.setLevel(logging.INFO if not debug else logging.DEBUG)
         
         self.logger.info("初始化ExtractionAgent...")
         self.logger.info("ExtractionAgent初始化完成。")
     
-    def _setup_logger(self, debug):
-        """设置日志记录器"""
-        logger = logging.getLogger("ExtractionAgent")
-        if not logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-            handler.setFormatter(formatter)
-            logger.addHandler(handler)
-            logger.setLevel(logging.INFO if not debug else logging.DEBUG)
-        return logger
-
+    def close(self):
+        """关闭后台事件循环及其异步HTTP会话"""
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        if self._async_session is not None:
+            asyncio.run_coroutine_threadsafe(self._async_session.close(), loop).result()
+            self._async_session = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._loop_thread.join()
+        loop.close()
+    
+    def _run_coroutine(self, coro):
+        """在后台事件循环中运行协程并等待结果（调用线程是否已有事件循环均可使用）"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name="ExtractionAgentLoop", daemon=True)
+                self._loop_thread.start()
+            loop = self._loop
+        # 在事件循环线程内部同步等待会导致死锁（例如在on_batch_done回调中再次发起提取）
+        if threading.current_thread() is self._loop_thread:
+            coro.close()
+            raise RuntimeError("不能在提取Agent的事件循环线程中同步等待协程")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+    
     def extract_specific_values(self, text, identified_states, parallel=True, max_workers=4, batch=False,
-                                batch_by_group=True):
+                                batch_by_group=True, force_refresh=False, on_batch_done=None):
         """
         提取具体的物理状态值，支持并行处理和批处理
 
@@ -58,6 +179,10 @@ class ExtractionAgent:
             max_workers: 并行处理时的最大工作线程数
             batch: 是否使用批处理模式
             batch_by_group: 批处理模式下是否按物理状态组分组
+            force_refresh: 是否忽略LLM响应缓存，重新调用API
+            on_batch_done: 按组批处理模式下，每个批次提取完成后以(批次序号, 该批次的结果列表)调用的回调，
+                           调用方可借此在全部提取结束前开始后续处理；回调出错不影响该批次的结果；
+                           其他模式下不会调用
 
         返回:
             提取结果的列表
@@ -69,12 +194,17 @@ class ExtractionAgent:
         if not identified_states:
             self.logger.warning("没有识别出物理状态组合，无法提取具体值")
             return []
-        
+
+        # 在分发任务前构建一次共享前缀，避免多个工作线程同时未命中缓存而重复拼接整篇文档
+        if len(text) + _CONTEXT_PREFIX_OVERHEAD <= self.max_text_length:
+            self._build_context_prefix(text)
+
         # 根据处理模式选择不同的提取策略
         if batch:
-            return self._process_in_batch_mode(text, identified_states, parallel, max_workers, batch_by_group)
+            return self._process_in_batch_mode(text, identified_states, parallel, max_workers, batch_by_group,
+                                               force_refresh, on_batch_done)
         else:
-            return self._process_individual_items(text, identified_states, parallel, max_workers)
+            return self._process_individual_items(text, identified_states, parallel, max_workers, force_refresh)
 
     def _log_processing_mode(self, batch, parallel, max_workers, batch_by_group):
         """记录处理模式信息"""
@@ -85,49 +215,60 @@ class ExtractionAgent:
         else:
             self.logger.info("正在提取具体的物理状态值...")
 
-    def _process_in_batch_mode(self, text, identified_states, parallel, max_workers, batch_by_group):
+    def _process_in_batch_mode(self, text, identified_states, parallel, max_workers, batch_by_group,
+                               force_refresh=False, on_batch_done=None):
         """批处理模式下的处理逻辑"""
         results = []
         
         if batch_by_group:
             # 按物理状态组分组批处理
-            return self._process_by_group(text, identified_states, parallel, max_workers)
+            return self._process_by_group(text, identified_states, parallel, max_workers, force_refresh,
+                                          on_batch_done)
         else:
             # 固定批次大小批处理
-            return self._process_by_fixed_batch_size(text, identified_states)
+            return self._process_by_fixed_batch_size(text, identified_states, force_refresh=force_refresh)
     
-    def _process_by_group(self, text, identified_states, parallel, max_workers):
+    def _process_by_group(self, text, identified_states, parallel, max_workers, force_refresh=False,
+                          on_batch_done=None):
         """按物理状态组进行分组批处理"""
         results = []
         
         # 按物理状态组分组
         groups = self._group_states_by_group(identified_states)
         
-        # 创建任务列表
-        tasks = [(group, states) for group, states in groups.items()]
+        # 将多个较小的物理状态组合并到同一请求中，减少请求次数
+        tasks = self._pack_groups(groups)
+        self.logger.info(f"{len(groups)}个物理状态组合并为{len(tasks)}个请求")
         
         # 处理各个批次
         if parallel and max_workers > 1:
             # 并行处理各个批次
-            results = self._process_batches_in_parallel(text, tasks, max_workers)
+            results = self._process_batches_in_parallel(text, tasks, max_workers, force_refresh, on_batch_done)
         else:
             # 串行处理各个批次
-            results = self._process_batches_sequentially(text, tasks)
+            results = self._process_batches_sequentially(text, tasks, force_refresh, on_batch_done)
             
         return results
     
     def _group_states_by_group(self, identified_states):
         """将物理状态按物理状态组分组"""
         groups = {}
+        seen_keys = set()
         for item in identified_states:
             group = item['物理状态组']
+            # 同一组内重复的物理状态只保留一次
+            key = (group, item['物理状态'])
+            if key in seen_keys:
+                continue
+            seen_keys.add(key)
             if group not in groups:
                 groups[group] = []
             groups[group].append(item)
         
         # 打印分组信息
-        group_counts = {g: len(s) for g, s in groups.items()}
-        self.logger.debug(f"物理状态组分组情况: {group_counts}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            group_counts = {g: len(s) for g, s in groups.items()}
+            self.logger.debug(f"物理状态组分组情况: {group_counts}")
         
         # 计算批次数量
         batch_count = len(groups)
@@ -135,37 +276,107 @@ class ExtractionAgent:
         
         return groups
     
-    def _process_batches_in_parallel(self, text, tasks, max_workers):
-        """并行处理批次任务"""
+    def _pack_groups(self, groups):
+        """
+        按状态列表长度预算，将多个物理状态组贪心地合并为若干组批次
+        
+        参数:
+            groups: 物理状态组到物理状态列表的映射
+            
+        返回:
+            组批次列表，每个组批次为[(物理状态组, 物理状态列表), ...]
+        """
+        group_batches = []
+        current_batch = []
+        current_length = 0
+        
+        for group, states in groups.items():
+            length = len(group) + sum(len(state['物理状态']) + 3 for state in states)
+            if current_batch and current_length + length > self.multigroup_states_budget:
+                group_batches.append(current_batch)
+                current_batch = []
+                current_length = 0
+            current_batch.append((group, states))
+            current_length += length
+        
+        if current_batch:
+            group_batches.append(current_batch)
+        
+        return group_batches
+    
+    def _format_group_batch(self, group_batch):
+        """生成组批次的日志描述"""
+        return "、".join(group for group, _ in group_batch)
+    
+    def _process_batches_in_parallel(self, text, tasks, max_workers, force_refresh=False, on_batch_done=None,
+                                     fill_missing=True):
+        """并行处理批次任务（异步并发请求，max_workers为最大并发请求数；fill_missing为是否为未提取到的状态补充默认项）"""
         results = []
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_group = {
-                executor.submit(self._process_single_batch, text, group, states): group
-                for group, states in tasks
-            }
-
-            for future in concurrent.futures.as_completed(future_to_group):
-                group = future_to_group[future]
-                try:
-                    batch_results = future.result()
-                    if batch_results:
-                        self.logger.info(f"成功从物理状态组 '{group}' 提取{len(batch_results)}个结果")
-                        results.extend(batch_results)
-                    else:
-                        self.logger.warning(f"从物理状态组 '{group}' 提取结果失败")
-                except Exception as e:
-                    self.logger.error(f"处理物理状态组 '{group}' 时出错: {e}")
+        all_batch_results = self._run_coroutine(
+            self._agather(self._aprocess_group_batch, text,
+                          [(group_batch, force_refresh, fill_missing) for group_batch in tasks], max_workers,
+                          on_done=on_batch_done)
+        )
+
+        for group_batch, batch_results in zip(tasks, all_batch_results):
+            group = self._format_group_batch(group_batch)
+            if isinstance(batch_results, Exception):
+                self.logger.error(f"处理物理状态组 '{group}' 时出错: {batch_results}")
+            elif batch_results:
+                self.logger.info(f"成功从物理状态组 '{group}' 提取{len(batch_results)}个结果")
+                results.extend(batch_results)
+            else:
+                self.logger.warning(f"从物理状态组 '{group}' 提取结果失败")
         
         return results
     
-    def _process_batches_sequentially(self, text, tasks):
-        """串行处理批次任务"""
+    async def _agather(self, coroutine_func, text, args_list, max_workers, on_done=None):
+        """在共享的异步HTTP会话中并发执行多个提取请求，使用信号量限制并发数
+        
+        参数:
+            coroutine_func: 异步处理函数，签名为(session, semaphore, text, *args)
+            text: 文档文本内容
+            args_list: 每个请求的参数元组列表
+            max_workers: 最大并发请求数
+            on_done: 可选回调，每个请求成功完成后立即以(请求序号, 结果)调用（在事件循环线程中执行，应尽快返回）
+            
+        返回:
+            与args_list顺序一致的结果列表，失败的请求对应异常对象
+        """
+        # 会话只在后台事件循环线程中创建和使用，无需加锁
+        if self._async_session is None or self._async_session.closed:
+            self._async_session = self.llm_service.create_async_session()
+        
+        semaphore = asyncio.Semaphore(max_workers)
+        
+        async def run(index, args):
+            result = await coroutine_func(self._async_session, semaphore, text, *args)
+            if on_done is not None:
+                self._notify_done(on_done, index, result)
+            return result
+        
+        return await asyncio.gather(*[run(index, args) for index, args in enumerate(args_list)],
+                                    return_exceptions=True)
+    
+    def _notify_done(self, on_done, index, result):
+        """调用请求完成回调；回调出错只记录日志，不影响该请求已得到的结果"""
+        try:
+            on_done(index, result)
+        except Exception as e:
+            self.logger.error(f"处理第{index + 1}个请求的完成回调时出错: {e}")
+    
+    def _process_batches_sequentially(self, text, tasks, force_refresh=False, on_batch_done=None,
+                                      fill_missing=True):
+        """串行处理批次任务（fill_missing为是否为未提取到的状态补充默认项）"""
         results = []
         
-        for group, states in tasks:
+        for index, group_batch in enumerate(tasks):
+            group = self._format_group_batch(group_batch)
             try:
-                batch_results = self._process_single_batch(text, group, states)
+                batch_results = self._process_group_batch(text, group_batch, force_refresh, fill_missing)
+                if on_batch_done is not None:
+                    self._notify_done(on_batch_done, index, batch_results)
                 if batch_results:
                     self.logger.info(f"成功从物理状态组 '{group}' 提取{len(batch_results)}个结果")
                     results.extend(batch_results)
@@ -176,9 +387,10 @@ class ExtractionAgent:
         
         return results
     
-    def _process_by_fixed_batch_size(self, text, identified_states, batch_size=3):
+    def _process_by_fixed_batch_size(self, text, identified_states, batch_size=3, force_refresh=False):
         """按固定批次大小处理数据"""
         results = []
+        identified_states = self._dedupe_states(identified_states)
         total_items = len(identified_states)
         num_batches = (total_items + batch_size - 1) // batch_size
 
@@ -187,12 +399,14 @@ class ExtractionAgent:
         for i in range(0, total_items, batch_size):
             batch = identified_states[i:i + batch_size]
 
+            # 同一批次内按物理状态组合并，每个组只发送一次请求
+            batch_groups = {}
             for item in batch:
-                group = item['物理状态组']
-                states = [item]
+                batch_groups.setdefault(item['物理状态组'], []).append(item)
 
+            for group, states in batch_groups.items():
                 try:
-                    batch_results = self._process_single_batch(text, group, states)
+                    batch_results = self._process_single_batch(text, group, states, force_refresh)
                     if batch_results:
                         results.extend(batch_results)
                 except Exception as e:
@@ -200,81 +414,173 @@ class ExtractionAgent:
         
         return results
     
-    def _process_individual_items(self, text, identified_states, parallel, max_workers):
+    def _process_individual_items(self, text, identified_states, parallel, max_workers, force_refresh=False):
         """处理单个物理状态项目（非批处理模式）"""
-        results = []
+        unique_states = self._dedupe_states(identified_states)
         
-        if parallel and max_workers > 1:
+        if self.items_per_request > 1:
+            # 多个物理状态组合合并为一次请求，减少重复发送文档全文的次数
+            item_results = self._process_items_in_chunks(text, unique_states, parallel, max_workers, force_refresh)
+        elif parallel and max_workers > 1:
             # 并行处理
-            results = self._process_items_in_parallel(text, identified_states, max_workers)
+            item_results = self._process_items_in_parallel(text, unique_states, max_workers, force_refresh)
         else:
             # 串行处理
-            results = self._process_items_sequentially(text, identified_states)
+            item_results = self._process_items_sequentially(text, unique_states, force_refresh)
+        
+        # 将结果映射回原始列表中的每个位置
+        results_by_key = {(item['物理状态组'], item['物理状态']): result for item, result in item_results}
+        results = []
+        seen_keys = set()
+        for item in identified_states:
+            key = (item['物理状态组'], item['物理状态'])
+            result = results_by_key.get(key)
+            if result:
+                # 重复的位置使用副本，避免后续修改相互影响
+                results.append(dict(result) if key in seen_keys else result)
+                seen_keys.add(key)
         
         return results
     
-    def _process_items_in_parallel(self, text, identified_states, max_workers):
-        """并行处理单个物理状态项目"""
+    def _dedupe_states(self, identified_states):
+        """去除重复的(物理状态组, 物理状态)组合，保留首次出现的顺序"""
+        unique_items = {}
+        for item in identified_states:
+            unique_items.setdefault((item['物理状态组'], item['物理状态']), item)
+        
+        if len(unique_items) < len(identified_states):
+            self.logger.info(f"跳过{len(identified_states) - len(unique_items)}个重复的物理状态组合")
+        return list(unique_items.values())
+    
+    def _process_items_in_chunks(self, text, identified_states, parallel, max_workers, force_refresh=False):
+        """
+        按固定数量将物理状态组合（可跨物理状态组）合并为一次请求处理
+        
+        参数:
+            text: 文档文本内容
+            identified_states: 去重后的物理状态组合列表
+            parallel: 是否并行处理各个请求
+            max_workers: 最大并发请求数
+            force_refresh: 是否忽略LLM响应缓存
+            
+        返回:
+            [(项目, 结果), ...]，只包含请求中列出的物理状态组合
+        """
+        tasks = []
+        for i in range(0, len(identified_states), self.items_per_request):
+            chunk_groups = {}
+            for item in identified_states[i:i + self.items_per_request]:
+                chunk_groups.setdefault(item['物理状态组'], []).append(item)
+            tasks.append(list(chunk_groups.items()))
+        
+        self.logger.info(
+            f"将{len(identified_states)}个物理状态组合分为{len(tasks)}个请求处理（每个请求最多{self.items_per_request}个）")
+        
+        # 复用组批处理的流程：单组时使用批处理提示，多组时使用多组合并提示；
+        # 与逐项请求一致，模型未返回的物理状态组合直接丢弃，不补充默认项
+        if parallel and max_workers > 1:
+            results = self._process_batches_in_parallel(text, tasks, max_workers, force_refresh, fill_missing=False)
+        else:
+            results = self._process_batches_sequentially(text, tasks, force_refresh, fill_missing=False)
+        
+        # 只保留请求中列出的物理状态组合，并补全缺失字段
+        requested_keys = {(item['物理状态组'], item['物理状态']) for item in identified_states}
+        item_results = []
+        for result in results:
+            key = (result.get('物理状态组'), result.get('物理状态'))
+            if key in requested_keys:
+                item_results.append((result, self._validate_and_fix_result(result, *key)))
+            else:
+                self.logger.warning(f"跳过未请求的物理状态组合: {key[0]}-{key[1]}")
+        
+        return item_results
+    
+    def _process_items_in_parallel(self, text, identified_states, max_workers, force_refresh=False):
+        """并行处理单个物理状态项目（异步并发请求，max_workers为最大并发请求数），返回[(项目, 结果), ...]"""
         results = []
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_item = {
-                executor.submit(self._process_single_item, text, item): item 
-                for item in identified_states
-            }
+        all_results = self._run_coroutine(
+            self._agather(self._aprocess_single_item, text,
+                          [(item, force_refresh) for item in identified_states], max_workers)
+        )
 
-            for future in concurrent.futures.as_completed(future_to_item):
-                item = future_to_item[future]
-                try:
-                    result = future.result()
-                    if result:
-                        results.append(result)
-                except Exception as e:
-                    self.logger.error(
-                        f"处理物理状态组合 '{item['物理状态组']}-{item['物理状态']}' 时出错: {e}")
+        for item, result in zip(identified_states, all_results):
+            if isinstance(result, Exception):
+                self.logger.error(
+                    f"处理物理状态组合 '{item['物理状态组']}-{item['物理状态']}' 时出错: {result}")
+            elif result:
+                results.append((item, result))
         
         return results
     
-    def _process_items_sequentially(self, text, identified_states):
-        """串行处理单个物理状态项目"""
+    def _process_items_sequentially(self, text, identified_states, force_refresh=False):
+        """串行处理单个物理状态项目，返回[(项目, 结果), ...]"""
         results = []
         
         for item in identified_states:
             try:
-                result = self._process_single_item(text, item)
+                result = self._process_single_item(text, item, force_refresh)
                 if result:
-                    results.append(result)
+                    results.append((item, result))
             except Exception as e:
                 self.logger.error(f"处理物理状态组合 '{item['物理状态组']}-{item['物理状态']}' 时出错: {e}")
         
         return results
     
-    def _process_single_item(self, text, item):
+    def _process_single_item(self, text, item, force_refresh=False):
         """处理单个物理状态组合"""
-        group = item['物理状态组']
-        state = item['物理状态']
+        system_prompt, prompt, cache_key = self._prepare_item_request(text, item)
 
-        # 构建提示
-        prompt = EXTRACTION_SINGLE_PROMPT.format(
-            EXTRACTION_GUIDELINES=EXTRACTION_GUIDELINES,
-            group=group,
-            state=state
-        ) + text
+        # 调用LLM API（单项结果为JSON对象，可使用JSON输出模式）
+        result = self.llm_service.call_llm_cached(
+            prompt, force_refresh=force_refresh, system_prompt=system_prompt,
+            response_format={"type": "json_object"}, cache_key=cache_key
+        )
 
-        # 检查文本长度
-        self._check_text_length(prompt)
+        return self._handle_item_response(result, item)
+    
+    async def _aprocess_single_item(self, session, semaphore, text, item, force_refresh=False):
+        """处理单个物理状态组合（异步版本）"""
+        system_prompt, prompt, cache_key = self._prepare_item_request(text, item)
+
+        async with semaphore:
+            result = await self.llm_service.acall_llm_cached(
+                session, prompt, force_refresh=force_refresh, system_prompt=system_prompt,
+                response_format={"type": "json_object"}, cache_key=cache_key
+            )
+
+        return self._handle_item_response(result, item)
+    
+    def _prepare_item_request(self, text, item):
+        """构建单个物理状态组合的提示，返回(系统提示, 任务提示, 前缀缓存键)"""
+        task = _single_task_prompt(item['物理状态组'], item['物理状态'])
+
+        # 构建共享前缀前先检查长度
+        self._check_prompt_length(text, task)
+
+        # 共享前缀（提取规则 + 文档）作为系统消息，具体任务作为用户消息
+        prefix, cache_key = self._build_context_prefix(text)
 
         # 调试日志
-        if self.debug:
-            self.logger.debug(f"使用的提示模板: {prompt[:200]}...")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"使用的提示模板: {task[:200]}...")
 
-        # 调用LLM API
-        result = self.llm_service.call_llm(prompt)
+        return prefix, task, cache_key
+    
+    def _handle_item_response(self, result, item):
+        """解析单个物理状态组合的API响应"""
+        group = item['物理状态组']
+        state = item['物理状态']
 
         if not result:
             self.logger.warning(f"API返回空响应，跳过物理状态 '{group}-{state}'")
             return None
 
+        # 响应本身就是JSON对象时直接解析，跳过正则提取
+        data = self._quick_load_json(result, dict)
+        if data is not None:
+            return self._validate_and_fix_result(data, group, state)
+
         # 从结果中提取JSON部分
         json_str = self.llm_service.extract_json_from_response(result)
 
@@ -285,16 +591,23 @@ class ExtractionAgent:
         # 解析并验证JSON
         return self._parse_and_validate_single_result(json_str, group, state)
     
-    def _check_text_length(self, text):
-        """检查文本长度是否超出限制"""
-        if len(text) > self.max_text_length:
+    def _build_context_prefix(self, text):
+        """构建同一文档所有提取请求共享的提示前缀，返回(前缀, 缓存键)
+        
+        缓存键由前缀内容生成，使同一文档的请求命中服务端的前缀缓存
+        """
+        return _context_prefix(text)
+    
+    def _check_prompt_length(self, text, task):
+        """检查由共享前缀（含文档文本）和任务部分组成的完整提示长度是否超出限制"""
+        if len(text) + _CONTEXT_PREFIX_OVERHEAD + len(task) > self.max_text_length:
             raise ValueError(f"文本长度超出限制: 最大允许长度为{self.max_text_length}字符")
     
     def _parse_and_validate_single_result(self, json_str, group, state):
         """解析和验证单个提取结果"""
         try:
             # 解析JSON
-            data = json.loads(json_str)
+            data = _json_loads(json_str)
 
             # 验证结果是否符合预期
             return self._validate_and_fix_result(data, group, state)
@@ -304,24 +617,23 @@ class ExtractionAgent:
     
     def _validate_and_fix_result(self, data, group, state):
         """验证提取结果并修复缺失字段"""
-        expected_keys = ["物理状态组", "物理状态", "试验项目", "物理状态值", "风险评价", "测试评语"]
+        missing_keys = _EXPECTED_KEYS - data.keys()
         
-        if not all(key in data for key in expected_keys):
-            missing_keys = [key for key in expected_keys if key not in data]
+        if missing_keys:
             self.logger.warning(f"响应中缺少必要字段: {missing_keys}")
 
-            # 添加缺失的字段
-            for key in missing_keys:
-                if key == "物理状态组":
-                    data[key] = group
-                elif key == "物理状态":
-                    data[key] = state
-                else:
-                    data[key] = "文中未提及" if key == "物理状态值" else "文档中未包含此信息"
+            # 按固定顺序添加缺失的字段，保证输出的字段顺序稳定
+            if "物理状态组" in missing_keys:
+                data["物理状态组"] = group
+            if "物理状态" in missing_keys:
+                data["物理状态"] = state
+            for key in _RESULT_KEYS[2:]:
+                if key in missing_keys:
+                    data[key] = _DEFAULT_VALUES[key]
 
         return data
 
-    def _process_single_batch(self, text, group, states):
+    def _process_single_batch(self, text, group, states, force_refresh=False, fill_missing=True):
         """
         处理单个批次的状态组合
         
@@ -329,49 +641,152 @@ class ExtractionAgent:
             text: 文档文本内容
             group: 物理状态组名称
             states: 该组下的物理状态列表
+            force_refresh: 是否忽略LLM响应缓存
+            fill_missing: 是否为未提取到的状态补充默认项
             
         返回:
             提取结果列表
         """
-        # 生成批处理提示
-        prompt = self._generate_batch_prompt(text, group, states)
+        system_prompt, prompt, cache_key = self._prepare_batch_request(text, group, states)
+
+        # 调用LLM API
+        result = self.llm_service.call_llm_cached(
+            prompt, force_refresh=force_refresh, system_prompt=system_prompt, cache_key=cache_key
+        )
+
+        return self._handle_batch_response(result, group, states, fill_missing)
+    
+    def _process_group_batch(self, text, group_batch, force_refresh=False, fill_missing=True):
+        """
+        处理一个组批次：只含一个物理状态组时按单组批处理，否则将多个组合并为一次请求
         
-        # 检查文本长度
-        self._check_text_length(prompt)
+        参数:
+            text: 文档文本内容
+            group_batch: [(物理状态组, 物理状态列表), ...]
+            force_refresh: 是否忽略LLM响应缓存
+            fill_missing: 是否为未提取到的状态补充默认项
+            
+        返回:
+            提取结果列表
+        """
+        if len(group_batch) == 1:
+            group, states = group_batch[0]
+            return self._process_single_batch(text, group, states, force_refresh, fill_missing)
+
+        system_prompt, prompt, cache_key = self._prepare_multigroup_request(text, group_batch)
+
+        # 调用LLM API
+        result = self.llm_service.call_llm_cached(
+            prompt, force_refresh=force_refresh, system_prompt=system_prompt, cache_key=cache_key
+        )
+
+        return self._handle_multigroup_response(result, group_batch, fill_missing)
+    
+    async def _aprocess_group_batch(self, session, semaphore, text, group_batch, force_refresh=False,
+                                    fill_missing=True):
+        """处理一个组批次（异步版本）"""
+        if len(group_batch) == 1:
+            group, states = group_batch[0]
+            system_prompt, prompt, cache_key = self._prepare_batch_request(text, group, states)
+        else:
+            system_prompt, prompt, cache_key = self._prepare_multigroup_request(text, group_batch)
+
+        async with semaphore:
+            result = await self.llm_service.acall_llm_cached(
+                session, prompt, force_refresh=force_refresh, system_prompt=system_prompt, cache_key=cache_key
+            )
+
+        if len(group_batch) == 1:
+            return self._handle_batch_response(result, group, states, fill_missing)
+        return self._handle_multigroup_response(result, group_batch, fill_missing)
+    
+    def _prepare_multigroup_request(self, text, group_batch):
+        """生成多组合并的批处理提示并检查长度，返回(系统提示, 任务提示, 前缀缓存键)"""
+        groups_str = "\n\n".join(
+            f"物理状态组: \"{group}\"\n" + "\n".join([f"- {state['物理状态']}" for state in states])
+            for group, states in group_batch
+        )
+        task = EXTRACTION_MULTIGROUP_PROMPT.format(groups_str=groups_str)
+        
+        # 构建共享前缀前先检查长度
+        self._check_prompt_length(text, task)
+        
+        prefix, cache_key = self._build_context_prefix(text)
         
         # 调试日志
-        if self.debug:
-            self.logger.debug(f"使用的提示模板: {prompt[:200]}...")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"使用的提示模板: {task[:200]}...")
 
-        # 调用LLM API
-        result = self.llm_service.call_llm(prompt)
+        return prefix, task, cache_key
+    
+    def _handle_multigroup_response(self, result, group_batch, fill_missing=True):
+        """解析多组合并的批处理响应，按物理状态组分发结果；fill_missing为真时补充缺失状态"""
+        if not result:
+            self.logger.warning(f"API返回空响应，跳过物理状态组 '{self._format_group_batch(group_batch)}'")
+            return []
+
+        groups = [group for group, _ in group_batch]
+        grouped_results = {}
+        
+        # 响应本身就是JSON数组时直接解析，跳过正则提取
+        items = self._quick_load_json(result, list)
+        if items is not None:
+            grouped_results = self._dispatch_items(items, groups)
+        else:
+            json_str = self.llm_service.extract_json_from_response(result, is_array=True)
+            if json_str:
+                grouped_results = self._dispatch_json_array(json_str, groups)
+            else:
+                self.logger.warning("无法从多组批处理响应中提取JSON数组")
 
+        if not fill_missing:
+            return [item for group, _ in group_batch for item in grouped_results.get(group, [])]
+
+        batch_results = []
+        for group, states in group_batch:
+            batch_results.extend(
+                self._check_and_fill_missing_states(grouped_results.get(group, []), group, states)
+            )
+        return batch_results
+    
+    def _prepare_batch_request(self, text, group, states):
+        """生成批处理提示并检查长度，返回(系统提示, 任务提示, 前缀缓存键)"""
+        task = _batch_task_prompt(group, tuple(state['物理状态'] for state in states))
+        
+        # 构建共享前缀前先检查长度
+        self._check_prompt_length(text, task)
+        
+        prefix, cache_key = self._build_context_prefix(text)
+        
+        # 调试日志
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"使用的提示模板: {task[:200]}...")
+
+        return prefix, task, cache_key
+    
+    def _handle_batch_response(self, result, group, states, fill_missing=True):
+        """解析批处理响应；fill_missing为真时补充缺失的状态"""
         if not result:
             self.logger.warning(f"API返回空响应，跳过物理状态组 '{group}'")
             return []
 
         # 解析结果
         batch_results = self._parse_batch_results(result, group)
+        if not fill_missing:
+            return batch_results
         
         # 检查结果完整性并补充缺失状态
         return self._check_and_fill_missing_states(batch_results, group, states)
     
-    def _generate_batch_prompt(self, text, group, states):
-        """生成批处理提示"""
-        # 每个状态准备一个简单的描述
-        states_str = "\n".join([f"- {state['物理状态']}" for state in states])
-        
-        # 构建提示
-        return EXTRACTION_BATCH_PROMPT.format(
-            EXTRACTION_GUIDELINES=EXTRACTION_GUIDELINES, 
-            group=group, 
-            states_str=states_str
-        ) + text
-    
     def _parse_batch_results(self, result, group):
         """解析批处理结果"""
         batch_results = []
         
+        # 响应本身就是JSON数组时直接解析，跳过正则提取
+        items = self._quick_load_json(result, list)
+        if items is not None:
+            return self._dispatch_items(items, [group]).get(group, [])
+        
         # 先尝试解析为JSON数组
         json_str = self.llm_service.extract_json_from_response(result, is_array=True)
         
@@ -385,57 +800,107 @@ class ExtractionAgent:
             
         return batch_results
     
+    def _quick_load_json(self, result, expected_type):
+        """
+        快速解析响应中的JSON：响应本身就是完整JSON时直接解析，
+        否则单次扫描出第一个顶层数组或对象（如Markdown代码块或说明文字中的JSON）再解析
+        
+        参数:
+            result: LLM的响应文本
+            expected_type: 期望的类型，list或dict
+            
+        返回:
+            解析结果；找不到、解析失败或类型不符时返回None，由调用方回退到正则提取
+        """
+        stripped = result.strip()
+        if stripped[:1] != ('[' if expected_type is list else '{'):
+            span = _scan_top_level(stripped, expected_type)
+            if span is None:
+                return None
+            stripped = stripped[span[0]:span[1]]
+        try:
+            data = _json_loads(stripped)
+        except ValueError:
+            return None
+        return data if isinstance(data, expected_type) else None
+    
     def _parse_json_array(self, json_str, group):
         """解析JSON数组格式的结果"""
-        batch_results = []
+        return self._dispatch_json_array(json_str, [group]).get(group, [])
+    
+    def _dispatch_json_array(self, json_str, groups):
+        """
+        解析JSON数组格式的结果，并按"物理状态组"字段分发到对应的组
         
+        参数:
+            json_str: JSON数组字符串
+            groups: 本次请求的物理状态组列表
+            
+        返回:
+            物理状态组到结果列表的映射，不属于groups的项会被跳过
+        """
         try:
-            items = json.loads(json_str)
-            if isinstance(items, list):
-                # 验证每个项是否属于当前组
-                for item in items:
-                    if isinstance(item, dict) and "物理状态组" in item:
-                        if item["物理状态组"] == group:
-                            batch_results.append(item)
-                        else:
-                            self.logger.warning(f"跳过不匹配的物理状态组：{item['物理状态组']}（期望：{group}）")
-                    else:
-                        self.logger.warning("提取的JSON数组包含无效项或缺少'物理状态组'字段")
-            else:
-                self.logger.warning("提取的JSON不是有效的数组")
+            items = _json_loads(json_str)
         except Exception as e:
             self.logger.error(f"解析JSON数组失败: {e}")
+            return {}
             
-        return batch_results
+        return self._dispatch_items(items, groups)
+    
+    def _dispatch_items(self, items, groups):
+        """将已解析的JSON数组按"物理状态组"字段分发到对应的组，不属于groups的项会被跳过"""
+        grouped_results = {}
+        
+        if isinstance(items, list):
+            # 验证每个项是否属于请求的组
+            for item in items:
+                if isinstance(item, dict) and "物理状态组" in item:
+                    if item["物理状态组"] in groups:
+                        grouped_results.setdefault(item["物理状态组"], []).append(item)
+                    else:
+                        self.logger.warning(
+                            f"跳过不匹配的物理状态组：{item['物理状态组']}（期望：{'、'.join(groups)}）")
+                else:
+                    self.logger.warning("提取的JSON数组包含无效项或缺少'物理状态组'字段")
+        else:
+            self.logger.warning("提取的JSON不是有效的数组")
+            
+        return grouped_results
     
     def _parse_single_json_object(self, result, group):
         """解析单个JSON对象格式的结果"""
         batch_results = []
         
-        json_str = self.llm_service.extract_json_from_response(result)
-        if json_str:
+        # 响应本身就是JSON对象时直接解析，跳过正则提取
+        single_item = self._quick_load_json(result, dict)
+        if single_item is None:
+            json_str = self.llm_service.extract_json_from_response(result)
+            if not json_str:
+                return batch_results
             try:
-                single_item = json.loads(json_str)
-                if isinstance(single_item, dict):
-                    # 确保物理状态组一致
-                    if "物理状态组" in single_item:
-                        if single_item["物理状态组"] == group:
-                            # 把单个项目包装成数组
-                            batch_results = [single_item]
-                        else:
-                            # 不匹配时，记录并返回空结果
-                            self.logger.warning(f"跳过不匹配的物理状态组：{single_item['物理状态组']}（期望：{group}）")
-                    else:
-                        self.logger.warning("提取的JSON对象缺少'物理状态组'字段")
-                else:
-                    self.logger.warning("提取的JSON不是有效的对象")
+                single_item = _json_loads(json_str)
             except Exception as e:
                 self.logger.error(f"解析单个JSON对象失败: {e}")
+                return batch_results
+        
+        if isinstance(single_item, dict):
+            # 确保物理状态组一致
+            if "物理状态组" in single_item:
+                if single_item["物理状态组"] == group:
+                    # 把单个项目包装成数组
+                    batch_results = [single_item]
+                else:
+                    # 不匹配时，记录并返回空结果
+                    self.logger.warning(f"跳过不匹配的物理状态组：{single_item['物理状态组']}（期望：{group}）")
+            else:
+                self.logger.warning("提取的JSON对象缺少'物理状态组'字段")
+        else:
+            self.logger.warning("提取的JSON不是有效的对象")
                 
         return batch_results
     
     def _check_and_fill_missing_states(self, batch_results, group, states):
-        """检查结果完整性并补充缺失的状态"""
+        """检查结果完整性并按请求顺序补充缺失的状态（states为该组请求的物理状态项目列表）"""
         # 检查是否成功提取
         if not batch_results:
             self.logger.warning(f"未能从物理状态组 '{group}' 提取到有效结果")
@@ -443,28 +908,18 @@ class ExtractionAgent:
         
         self.logger.info(f"从物理状态组 '{group}' 提取到 {len(batch_results)} 个结果")
 
-        # 检查结果是否完整
-        expected_states = {state['物理状态'] for state in states}
+        # 检查结果是否完整：一次遍历收集已提取的状态，再按请求顺序找出缺失的状态
         extracted_states = {item['物理状态'] for item in batch_results if '物理状态' in item}
-        missing_states = expected_states - extracted_states
+        missing_states = [state['物理状态'] for state in states if state['物理状态'] not in extracted_states]
 
         if missing_states:
             self.logger.warning(f"物理状态组 '{group}' 中有未提取到的状态: {missing_states}")
 
             # 为缺失的状态创建默认项
-            for missing in missing_states:
-                default_item = self._create_default_item(group, missing)
-                batch_results.append(default_item)
+            batch_results.extend(self._create_default_item(group, missing) for missing in missing_states)
 
         return batch_results
     
     def _create_default_item(self, group, state):
         """创建默认的状态项目"""
-        return {
-            "物理状态组": group,
-            "物理状态": state,
-            "试验项目": "文中未提及",
-            "物理状态值": "文中未提及",
-            "风险评价": "可用",  # 默认风险评价
-            "测试评语": "文档中未包含此信息"
-        }
\ No newline at end of file
+        return {"物理状态组": group, "物理状态": state, **_DEFAULT_TEMPLATE}
\ No newline at end of file
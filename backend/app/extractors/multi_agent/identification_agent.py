@@ -3,6 +3,22 @@ import logging
 import re
 from ..llm_service import LLMService
 from .prompts import IDENTIFICATION_PROMPT
+from ._logging import get_logger
+
+try:
+    # orjson解析速度明显快于标准库json，未安装时回退到标准库
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+
+# 识别提示模板的固定长度，用于在拼接前检查完整提示长度
+_PROMPT_LEN = len(IDENTIFICATION_PROMPT)
+
+
+# 模块级日志记录器，处理器只在导入时配置一次
+logger = get_logger("IdentificationAgent")
 
 
 class IdentificationAgent:
@@ -28,45 +44,43 @@ class IdentificationAgent:
         self.debug = debug
 
         # 配置日志
-        self.logger = logging.getLogger("IdentificationAgent")
-        if not self.logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-            handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
-            self.logger.setLevel(logging.INFO if not debug else logging.DEBUG)
+        self.logger = logger
+        self.logger.setLevel(logging.INFO if not debug else logging.DEBUG)
 
         self.logger.info("初始化IdentificationAgent...")
         self.logger.info("IdentificationAgent初始化完成。")
 
-    def identify_groups_and_states(self, text):
+    def identify_groups_and_states(self, text, force_refresh=False):
         """
         识别文档中出现的物理状态组和物理状态
 
         参数:
             text: 待分析的文档文本
             use_simplified_prompt: 是否使用简化的提示（用于备用提取）
+            force_refresh: 是否忽略LLM响应缓存，重新调用API
 
         返回:
             识别出的物理状态组和物理状态列表
         """
         self.logger.info("正在识别文档中的物理状态组和物理状态...")
 
-        # 提示模板
-        prompt = IDENTIFICATION_PROMPT + text
-
-        # 限制文本长度，避免超出模型的处理能力
+        # 限制文本长度，避免超出模型的处理能力；在拼接完整提示前检查，超长时不必构建大字符串
         max_text_length = 20000  # 根据模型能力调整，避免超过模型的token限制
-        if len(prompt) > max_text_length:
+        if len(text) + _PROMPT_LEN > max_text_length:
             raise ValueError(f"文本长度超出限制: 最大允许长度为{max_text_length}字符")
 
-        if self.debug:
+        # 提示模板
+        prompt = IDENTIFICATION_PROMPT + text
+
+        if self.logger.isEnabledFor(logging.DEBUG):
             self.logger.debug(f"使用的提示模板: {prompt[:200]}...")
 
-        # 调用LLM API
-        result = self.llm_service.call_llm(prompt)
+        # 调用LLM API（识别结果为JSON对象，可使用JSON输出模式）
+        result = self.llm_service.call_llm_cached(
+            prompt, force_refresh=force_refresh, response_format={"type": "json_object"}
+        )
 
-        if self.debug:
+        if self.logger.isEnabledFor(logging.DEBUG):
             self.logger.debug(f"API响应: {result[:500]}...")
 
         # 解析结果
@@ -83,7 +97,7 @@ class IdentificationAgent:
                 self.logger.error(f"JSON字符串格式不正确: {json_str[:100]}")
                 return []
 
-            data = json.loads(json_str)
+            data = _json_loads(json_str)
 
             # 处理可能出现的大小写问题
             if "identified_States" in data and "identified_states" not in data:
@@ -97,6 +111,7 @@ class IdentificationAgent:
                 return []
 
             self.logger.info(f"识别出{len(identified_states)}个物理状态组合")
+            debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
             for item in identified_states:
                 if not isinstance(item, dict):
                     self.logger.error(f"物理状态项不是字典类型: {type(item)}")
@@ -104,7 +119,8 @@ class IdentificationAgent:
                 if '物理状态组' not in item or '物理状态' not in item:
                     self.logger.error(f"物理状态项缺少必要字段: {item}")
                     continue
-                self.logger.debug(f"  - {item['物理状态组']} -> {item['物理状态']}")
+                if debug_enabled:
+                    self.logger.debug(f"  - {item['物理状态组']} -> {item['物理状态']}")
 
             return identified_states
         except json.JSONDecodeError as e:
@@ -7,13 +7,21 @@ Multi-Agent架构中的prompt模板包
 """
 
 from .identification import IDENTIFICATION_PROMPT
-from .extraction import EXTRACTION_GUIDELINES, EXTRACTION_SINGLE_PROMPT, EXTRACTION_BATCH_PROMPT
+from .extraction import (
+    EXTRACTION_GUIDELINES,
+    EXTRACTION_CONTEXT_PREFIX,
+    EXTRACTION_SINGLE_PROMPT,
+    EXTRACTION_BATCH_PROMPT,
+    EXTRACTION_MULTIGROUP_PROMPT,
+)
 from .validation import VALIDATION_PROMPT
 
 __all__ = [
     'IDENTIFICATION_PROMPT',
     'EXTRACTION_GUIDELINES',
+    'EXTRACTION_CONTEXT_PREFIX',
     'EXTRACTION_SINGLE_PROMPT',
     'EXTRACTION_BATCH_PROMPT',
+    'EXTRACTION_MULTIGROUP_PROMPT',
     'VALIDATION_PROMPT',
 ]
\ No newline at end of file
@@ -69,7 +69,18 @@ EXTRACTION_GUIDELINES = """
 """
 
 
-EXTRACTION_SINGLE_PROMPT = """请从以下文本中提取关于"{group}"的"{state}"的具体物理状态值、风险评价和测试评语信息。
+# 所有提取请求共享的提示前缀：提取规则 + 文档全文
+# 前缀作为系统消息发送且对同一文档保持不变，便于服务端复用前缀缓存（Prompt Cache）
+EXTRACTION_CONTEXT_PREFIX = """请阅读以下提取规则和航天电子元件可靠性分析文档全文，具体的提取任务将在用户消息中给出。
+{EXTRACTION_GUIDELINES}
+文本内容：
+{text}
+
+"""
+
+
+EXTRACTION_SINGLE_PROMPT = """[提取任务]
+请从上述文本中提取关于"{group}"的"{state}"的具体物理状态值、风险评价和测试评语信息。
 
 任务目标:
 从航天电子元件可靠性分析文档中提取指定物理状态组和物理状态的具体值、风险评价,并根据上下文生成测试评语。
@@ -78,8 +89,6 @@ EXTRACTION_SINGLE_PROMPT = """请从以下文本中提取关于"{group}"的"{sta
 物理状态组: "{group}"
 物理状态: "{state}"
 
-{EXTRACTION_GUIDELINES}
-
 提取策略:
 1. 先通读全文，确定与目标物理状态相关的所有描述段落
 2. 优先关注专门描述该物理状态的章节或段落
@@ -88,7 +97,7 @@ EXTRACTION_SINGLE_PROMPT = """请从以下文本中提取关于"{group}"的"{sta
 5. 判断风险评价时，严格遵循文档中的明确表述
 6. 生成测试评语时，基于状态值附近的描述或默认为"常规结构，无可靠性隐患"
 
-返回格式：
+请以JSON对象格式返回，格式如下：
 {{
     "物理状态组": "{group}",
     "物理状态": "{state}",
@@ -97,11 +106,10 @@ EXTRACTION_SINGLE_PROMPT = """请从以下文本中提取关于"{group}"的"{sta
     "风险评价": "可用/限用/禁用（从文本明确判断）或/（未提及）",
     "测试评语": "从文本中提取或按规则生成的评语"
 }}
-
-文本内容：
 """
 
-EXTRACTION_BATCH_PROMPT = """请分析以下文本，提取关于"{group}"物理状态组的以下物理状态信息：
+EXTRACTION_BATCH_PROMPT = """[提取任务]
+请分析上述文本，提取关于"{group}"物理状态组的以下物理状态信息：
 
 {states_str}
 
@@ -114,13 +122,10 @@ EXTRACTION_BATCH_PROMPT = """请分析以下文本，提取关于"{group}"物理
 如果识别到其他组的信息，请完全忽略，不要在结果中包含。
 
 物理状态名称严格限制:
-请注意：返回的"物理状态"字段值必须严格从以下列表中选择，不要使用其他名称（如试验项目名称等）：
-{states_str}
-
-{EXTRACTION_GUIDELINES}
+请注意：返回的"物理状态"字段值必须严格从上面列出的物理状态中选择，不要使用其他名称（如试验项目名称等）。
 
 提取策略:
-1. 首先识别文档中与"{{group}}"物理状态组相关的所有段落
+1. 首先识别文档中与"{group}"物理状态组相关的所有段落
 2. 对于每个列出的物理状态，寻找相关描述
 3. 提取物理状态值时，注重提炼核心信息，去除冗余描述
 4. 识别试验项目时，考虑物理状态的性质选择最合理的项目
@@ -147,6 +152,46 @@ EXTRACTION_BATCH_PROMPT = """请分析以下文本，提取关于"{group}"物理
     }}
     ...
 ]
+"""
+EXTRACTION_MULTIGROUP_PROMPT = """[提取任务]
+请分析上述文本，一次性提取以下多个物理状态组的物理状态信息：
 
-文本内容：
-"""
\ No newline at end of file
+{groups_str}
+
+任务目标:
+从航天电子元件可靠性分析文档中针对上面列出的多个物理状态组，批量提取每个物理状态的相关信息。
+
+物理状态组与物理状态名称严格限制:
+1. 返回的"物理状态组"字段值必须是上面列出的物理状态组之一
+2. 返回的"物理状态"字段值必须是对应物理状态组下列出的物理状态之一，不要使用其他名称（如试验项目名称等）
+3. 不要返回未列出的物理状态组或物理状态的信息
+
+提取策略:
+1. 对于每个列出的物理状态组，识别文档中与之相关的所有段落
+2. 对于该组下每个列出的物理状态，寻找相关描述
+3. 提取物理状态值时，注重提炼核心信息，去除冗余描述
+4. 识别试验项目时，考虑物理状态的性质选择最合理的项目
+5. 判断风险评价时，严格遵循文档中的明确表述
+6. 生成测试评语时，基于状态值附近的描述或默认为"常规结构，无可靠性隐患"
+
+请以一个扁平的JSON数组返回所有物理状态组的提取结果，每项用"物理状态组"字段标明所属组：
+[
+    {{
+        "物理状态组": "第一个物理状态组名称",
+        "物理状态": "该组下的物理状态名称",
+        "试验项目": "提取或推断的试验项目",
+        "物理状态值": "简明扼要的物理状态值",
+        "风险评价": "可用/限用/禁用（明确提及）或/（未提及）",
+        "测试评语": "从文本中提取或按规则生成的评语"
+    }},
+    {{
+        "物理状态组": "第二个物理状态组名称",
+        "物理状态": "该组下的物理状态名称",
+        "试验项目": "提取或推断的试验项目",
+        "物理状态值": "简明扼要的物理状态值",
+        "风险评价": "可用/限用/禁用（明确提及）或/（未提及）",
+        "测试评语": "从文本中提取或按规则生成的评语"
+    }}
+    ...
+]
+"""
@@ -1,10 +1,29 @@
 import json
 import logging
 import re
-from collections import defaultdict
+import concurrent.futures
+from itertools import groupby
 
 from ..llm_service import LLMService
 from .prompts import VALIDATION_PROMPT
+from ._logging import get_logger
+
+try:
+    # orjson解析速度明显快于标准库json，未安装时回退到标准库
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+
+def _result_group(result):
+    """提取结果所属的物理状态组，缺失时归为未知组"""
+    return result.get("物理状态组", "未知组")
+
+
+# 模块级日志记录器，处理器只在导入时配置一次
+logger = get_logger("ValidationAgent")
 
 
 class ValidationAgent:
@@ -30,24 +49,21 @@ class ValidationAgent:
         self.debug = debug
 
         # 配置日志
-        self.logger = logging.getLogger("ValidationAgent")
-        if not self.logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-            handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
-            self.logger.setLevel(logging.INFO if not debug else logging.DEBUG)
+        self.logger = logger
+        self.logger.setLevel(logging.INFO if not debug else logging.DEBUG)
 
         self.logger.info("初始化ValidationAgent...")
         self.logger.info("ValidationAgent初始化完成。")
 
-    def validate_extraction_results(self, text, extraction_results):
+    def validate_extraction_results(self, text, extraction_results, max_workers=1, force_refresh=False):
         """
         验证提取结果并优化，尤其是拆分复杂的物理状态值
 
         参数:
             text: 原始文本内容
             extraction_results: 初步提取的结果
+            max_workers: 并行验证的最大线程数，各物理状态组的验证请求相互独立；为1时逐组串行验证
+            force_refresh: 是否忽略LLM响应缓存，重新调用API
 
         返回:
             优化后的提取结果
@@ -57,34 +73,45 @@ class ValidationAgent:
         # 按物理状态组组织结果，方便后续处理
         organized_results = self._organize_results_by_group(extraction_results)
 
-        # 逐个验证各物理状态组的结果
+        # 验证各物理状态组的结果，结果按组的原始顺序汇总
         validated_results = []
-        for group_name, group_results in organized_results.items():
-            # 对每个组单独进行验证
-            validated_group_results = self._validate_group_results(text, group_name, group_results)
-            # 将验证后的结果添加到总结果列表
-            validated_results.extend(validated_group_results)
+        if max_workers > 1 and len(organized_results) > 1:
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=min(max_workers, len(organized_results))) as executor:
+                group_results_list = executor.map(
+                    lambda entry: self._validate_group_results(text, *entry, force_refresh=force_refresh),
+                    organized_results.items())
+                for validated_group_results in group_results_list:
+                    validated_results.extend(validated_group_results)
+        else:
+            for group_name, group_results in organized_results.items():
+                # 对每个组单独进行验证
+                validated_group_results = self._validate_group_results(
+                    text, group_name, group_results, force_refresh=force_refresh)
+                # 将验证后的结果添加到总结果列表
+                validated_results.extend(validated_group_results)
 
         self.logger.info(f"验证和优化完成，最终结果包含{len(validated_results)}个项目")
         return validated_results
 
     def _organize_results_by_group(self, extraction_results):
-        """将提取结果按物理状态组组织"""
-        organized = defaultdict(list)
-        for result in extraction_results:
-            group = result.get("物理状态组", "未知组")
-            organized[group].append(result)
+        """将提取结果按物理状态组组织，保持各组首次出现的顺序"""
+        # 提取结果通常已按组连续排列，逐段合并即可，无需排序（排序会打乱组的原始顺序）
+        organized = {}
+        for group, group_results in groupby(extraction_results, key=_result_group):
+            organized.setdefault(group, []).extend(group_results)
         return organized
 
-    def _validate_group_results(self, text, group_name, group_results):
+    def _validate_group_results(self, text, group_name, group_results, force_refresh=False):
         """验证特定物理状态组的结果"""
         self.logger.info(f"验证物理状态组 '{group_name}' 的{len(group_results)}个结果...")
 
-        # 构建验证提示
-        prompt = self._build_validation_prompt(text, group_name, group_results)
+        # 构建验证提示（提取结果只序列化一次）
+        results_json = self._dump_group_results(group_results)
+        prompt = self._build_validation_prompt(text, group_name, results_json)
 
-        # 调用LLM进行验证
-        validation_response = self.llm_service.call_llm(prompt)
+        # 调用LLM进行验证（相同的验证提示直接复用缓存的响应）
+        validation_response = self.llm_service.call_llm_cached(prompt, force_refresh=force_refresh)
 
         if not validation_response:
             self.logger.warning(f"验证物理状态组 '{group_name}' 时获取空响应，将使用原始结果")
@@ -99,7 +126,7 @@ class ValidationAgent:
 
         # 解析验证结果
         try:
-            validated_results = json.loads(validated_json)
+            validated_results = _json_loads(validated_json)
 
             # 验证结果合法性
             if not isinstance(validated_results, list):
@@ -135,11 +162,14 @@ class ValidationAgent:
             self.logger.error(f"验证处理过程出错: {e}")
             return group_results
 
-    def _build_validation_prompt(self, text, group_name, group_results):
-        """构建验证提示"""
-        # 转换提取结果为JSON字符串，便于在提示中使用
-        results_json = json.dumps(group_results, ensure_ascii=False, indent=2)
+    def _dump_group_results(self, group_results):
+        """将提取结果转换为JSON字符串，便于在提示中使用（orjson默认输出UTF-8，不转义中文）"""
+        if orjson is not None:
+            return orjson.dumps(group_results, option=orjson.OPT_INDENT_2).decode('utf-8')
+        return json.dumps(group_results, ensure_ascii=False, indent=2)
 
+    def _build_validation_prompt(self, text, group_name, results_json):
+        """构建验证提示（results_json为已序列化的提取结果）"""
         # 使用模板构建完整提示
         return VALIDATION_PROMPT.format(
             original_text=text,
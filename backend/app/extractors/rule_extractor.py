@@ -1,15 +1,397 @@
 import re
-import jieba
-import jieba.posseg as pseg
+import bisect
+try:
+    # jieba_fast是jieba的C扩展实现，接口相同，分词速度快数倍；未安装时回退到jieba
+    import jieba_fast as jieba
+    import jieba_fast.posseg as pseg
+except ImportError:
+    import jieba
+    import jieba.posseg as pseg
 import os
 import json
-from typing import Dict, List, Tuple, Any, Optional, Set
-# import torch
-from transformers import AutoTokenizer, AutoModelForTokenClassification, AutoModelForSequenceClassification
-from transformers import pipeline
+import importlib.util
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Tuple, Any, Optional, FrozenSet
+import numpy as np
 
 from .base_extractor import BaseExtractor
 
+try:
+    # ONNX Runtime推理比PyTorch FP32快且占用内存更少；未安装时使用transformers模型
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+try:
+    # RE2是线性时间的正则引擎，长句上不会因回溯而性能退化；未安装时回退到标准库re
+    import re2
+except ImportError:
+    re2 = None
+
+
+def _compile(pattern):
+    """编译正则，优先使用RE2，RE2不支持的模式回退到标准库re"""
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except Exception:
+            pass
+    return re.compile(pattern)
+
+
+# 模型目录下量化后的ONNX模型路径，由export_quantized_onnx生成
+_ONNX_MODEL_FILE = os.path.join("onnx", "model.quant.onnx")
+
+
+class _OnnxModel:
+    """ONNX Runtime推理会话的简单封装，调用时返回第一个输出（logits）"""
+
+    def __init__(self, model_file):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = os.cpu_count() or 1
+        providers = ["CPUExecutionProvider"]
+        if "CUDAExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, "CUDAExecutionProvider")
+        self.session = ort.InferenceSession(model_file, sess_options=options, providers=providers)
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def __call__(self, inputs):
+        # 只传入模型需要的输入（如部分模型没有token_type_ids）
+        feed = {name: np.asarray(inputs[name], dtype=np.int64) for name in self.input_names if name in inputs}
+        return self.session.run(None, feed)[0]
+
+
+def _load_onnx_model(model_path):
+    """模型目录下存在量化后的ONNX模型且已安装onnxruntime时加载，否则返回None"""
+    model_file = os.path.join(model_path, _ONNX_MODEL_FILE)
+    if ort is None or not os.path.exists(model_file):
+        return None
+    return _OnnxModel(model_file)
+
+
+def _pretrained_load_kwargs():
+    """
+    PyTorch模型from_pretrained的加载参数：安装了accelerate时跳过权重的随机初始化，
+    直接加载检查点权重（模型目录中有safetensors权重时transformers会优先以内存映射方式读取），
+    减少模型加载耗时和内存峰值
+    """
+    if importlib.util.find_spec("accelerate") is not None:
+        return {"low_cpu_mem_usage": True}
+    return {}
+
+
+def _prepare_torch_model(model):
+    """
+    将PyTorch模型切换到推理模式（关闭dropout等训练行为）；有GPU时移到GPU并转为FP16，
+    前向计算更快且显存占用减半（CPU上FP16计算反而更慢，保持FP32）
+    """
+    import torch
+    
+    model.eval()
+    if torch.cuda.is_available():
+        model = model.half().to("cuda")
+    return model
+
+
+def export_quantized_onnx(model_path, task="token-classification"):
+    """
+    将HuggingFace模型导出为ONNX并进行动态INT8量化（一次性操作），之后InformationExtractor会自动使用量化模型
+    
+    Args:
+        model_path: 模型目录
+        task: "token-classification"（NER模型）或"text-classification"（关系抽取模型）
+        
+    Returns:
+        量化后的ONNX模型路径
+    """
+    from optimum.onnxruntime import ORTModelForTokenClassification, ORTModelForSequenceClassification
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    
+    model_class = ORTModelForTokenClassification if task == "token-classification" \
+        else ORTModelForSequenceClassification
+    onnx_dir = os.path.join(model_path, "onnx")
+    model_class.from_pretrained(model_path, export=True).save_pretrained(onnx_dir)
+    
+    quantized_file = os.path.join(model_path, _ONNX_MODEL_FILE)
+    quantize_dynamic(os.path.join(onnx_dir, "model.onnx"), quantized_file, weight_type=QuantType.QInt8)
+    return quantized_file
+
+
+# 正则表达式在模块加载时编译一次，各提取方法直接复用编译后的对象
+
+# 分句规则，每条规则附带其匹配必需的标记，文本中不含任何标记时跳过该规则，省去一次整段文本的替换
+_SENTENCE_SPLIT_PATTERNS = tuple((markers, _compile(pattern)) for markers, pattern in [
+    (("。", "！", "？", "?"), r'([。！？\?])([^\"\'])'),
+    (("......",), r'(\.{6})([^\"\'])'),
+    (("……",), r'(\…{2})([^\"\'])'),
+    (("\"", "'"), r'([。！？\?][\"\'])([^，。！？\?])')
+])
+
+# 规则提取关系时使用的关系类型及其触发词
+_RELATION_TRIGGERS = (
+    ("包含", ("包含", "包括")),
+    ("采用", ("采用",)),
+    ("为", ("为",)),
+    ("是", ("是",)),
+    ("具有", ("具有",)),
+    ("属于", ("属于",)),
+)
+
+
+@lru_cache(maxsize=128)
+def _segment_sentences(text):
+    """
+    对文本进行分句；同一段文本在一次提取中会被实体提取、关系提取等多次分句，结果按文本缓存
+
+    返回:
+        分句后的句子元组
+    """
+    # 应用分句规则
+    for markers, pattern in _SENTENCE_SPLIT_PATTERNS:
+        if not any(marker in text for marker in markers):
+            continue
+        text = pattern.sub(r'\1\n\2', text)
+    
+    # 分割成句子
+    return tuple(text.rstrip().split('\n'))
+
+
+def _split_on_trigger(sentence, keywords):
+    """
+    在句中最后一个前后都有内容的触发词处将句子拆分为头、尾两部分，
+    与正则(.+)触发词(.+)的贪婪匹配结果相同，但只需用str.rfind查找触发词
+
+    返回:
+        (头部文本, 尾部文本)，句中没有符合条件的触发词时返回None
+    """
+    best_start, best_keyword = -1, None
+    for keyword in keywords:
+        # 触发词前后至少各有一个字符
+        start = sentence.rfind(keyword, 1, len(sentence) - 1)
+        if start > best_start:
+            best_start, best_keyword = start, keyword
+    if best_keyword is None:
+        return None
+    return sentence[:best_start], sentence[best_start + len(best_keyword):]
+
+
+def _build_entity_index(entities):
+    """
+    按实体词的首字建立倒排索引，用于快速查找文本中出现的实体
+
+    返回:
+        {首字: [(实体序号, 实体词, 实体), ...]}
+    """
+    index = defaultdict(list)
+    for order, entity in enumerate(entities):
+        word = entity["word"]
+        index[word[:1]].append((order, word, entity))
+    return index
+
+
+def _last_contained_entity(text, index):
+    """
+    在文本中查找出现过的实体，返回其中在实体列表里最靠后的一个；
+    只需逐字查看以该字开头的实体词，无需对每个实体做一次子串查找
+
+    返回:
+        实体，文本中没有出现任何实体时返回None
+    """
+    # 空实体词是任意文本的子串
+    empty = index.get("")
+    best = empty[-1] if empty else None
+    for position, char in enumerate(text):
+        for candidate in index.get(char, ()):
+            if (best is None or candidate[0] > best[0]) and text.startswith(candidate[1], position):
+                best = candidate
+    return best[2] if best else None
+
+# 模型识别实体时每次前向计算的句子数量
+_NER_BATCH_SIZE = 16
+
+# 模型提取关系时每次前向计算的实体对数量
+_RELATION_BATCH_SIZE = 32
+
+# 封装材料的分隔符
+_MATERIAL_SPLIT_RE = _compile(r'[、和及]')
+
+
+class _FieldPatterns:
+    """
+    同一字段按优先级排列的多个候选正则
+
+    结果与依次调用各模式的search、取第一个有匹配的模式相同，
+    但先用合并后的单个正则扫描一遍全文，多数情况下无需逐个扫描
+    """
+
+    def __init__(self, patterns):
+        self.patterns = tuple(_compile(pattern) for pattern in patterns)
+        # 每个模式恰好一个捕获组，合并后第i个捕获组对应第i个模式
+        if any(pattern.groups != 1 for pattern in self.patterns):
+            raise ValueError("每个候选正则必须恰好包含一个捕获组")
+        self.combined = _compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+    def search(self, text):
+        """返回第一个能匹配的模式的匹配结果，都不匹配时返回None"""
+        match = self.combined.search(text)
+        if match is None:
+            return None
+
+        # 只有实际匹配的那个模式的捕获组不为None
+        index = next(i for i, group in enumerate(match.groups()) if group is not None)
+        # 优先级更高的模式在该位置及之前都没有匹配，只需从下一个位置开始查找
+        for pattern in self.patterns[:index]:
+            later_match = pattern.search(text, match.start() + 1)
+            if later_match:
+                return later_match
+        return self.patterns[index].match(text, match.start())
+
+# 标识信息：型号规格
+_IDENTIFICATION_MODEL_PATTERNS = _FieldPatterns([
+    r"型号规格[（\(]([^）\)]+)[）\)]",
+    r"型号规格为([^，。；]+)",
+    r"器件型号[为是]([^，。；]+)",
+    r"器件型号规格为([^，。；]+)"
+])
+
+# 标识信息：生产批次
+_IDENTIFICATION_BATCH_PATTERNS = _FieldPatterns([
+    r"生产批次[（\(]([^）\)]+)[）\)]",
+    r"生产批次为([^，。；]+)",
+    r"批次[为号]([^，。；]+)",
+    r"生产批[号次][为是]([^，。；]+)"
+])
+
+# 标识信息：生产厂标识
+_IDENTIFICATION_VENDOR_PATTERNS = _FieldPatterns([
+    r"生产厂标识[（\(]([^）\)]+)[）\)]",
+    r"生产厂标识为([^，。；]+)",
+    r"厂家标识[为是]([^，。；]+)",
+    r"生产厂[为是]([^，。；]+)"
+])
+
+# 标识信息：标识方式
+_IDENTIFICATION_METHOD_PATTERNS = _FieldPatterns([
+    r"器件采用([\S]+)方式打标",
+    r"标识采用([\S]+)方式",
+    r"采用([\S]+)[打印刻]标",
+    r"标识方式[为是]([\S]+)"
+])
+
+# 标识信息：标识牢固度
+_IDENTIFICATION_DURABILITY_PATTERNS = _FieldPatterns([
+    r"标识牢固度([^，。；]+)",
+    r"标识牢固[性度][为是]([^，。；]+)",
+    r"标识[为是]([^，。；]*牢固[^，。；]*)"
+])
+
+# 问题与建议（各章节通用）
+_SUGGESTION_PATTERNS = tuple(_compile(pattern) for pattern in [
+    r"建议([^。；]+)",
+    r"存在[的]?问题[：:]([^。；]+)",
+    r"缺少([^，。；]+)",
+    r"问题[为是]([^。；]+)"
+])
+
+# 封装信息：封装类型
+_PACKAGE_TYPE_PATTERNS = _FieldPatterns([
+    r"器件采用([A-Z0-9]+[^，。；]*)[封装]",
+    r"封装类型[为是]([^，。；]+)",
+    r"采用([^，。；]+)封装",
+    r"([A-Z0-9]+\d+[A-Z]*)[^，。；]*封装"
+])
+
+# 封装信息：封装材料
+_PACKAGE_MATERIAL_PATTERNS = _FieldPatterns([
+    r"封装材料[为包括含]([^，。；]+)",
+    r"封装材料主要包括([^，。；]+)",
+    r"材料[为包括含]([^，。；]+)",
+    r"([^，。；]+材料[为是][^，。；]+)"
+])
+
+# 封装信息：封装工艺
+_PACKAGE_PROCESS_PATTERNS = _FieldPatterns([
+    r"封装工艺[为是采用]([^，。；]+)",
+    r"采用([^，。；]+)工艺",
+    r"工艺[为是]([^，。；]+)",
+    r"([^，。；]+)[工艺技术][^，。；]*封装"
+])
+
+# 封装信息：质量评估
+_PACKAGE_QUALITY_PATTERNS = _FieldPatterns([
+    r"质量评估[为是]([^，。；]+)",
+    r"工艺质量[为是]([^，。；]+)",
+    r"质量[为是]([^，。；]+)",
+    r"评估[为是]([^，。；]+)"
+])
+
+# 芯片信息：芯片装配结构
+_CHIP_STRUCTURE_PATTERNS = _FieldPatterns([
+    r"芯片装配结构[为是]([^，。；]+)",
+    r"芯片[为是]([^，。；]*结构[^，。；]*)",
+    r"装配结构[为是]([^，。；]+)",
+    r"([^，。；]+)结构[^，。；]*芯片"
+])
+
+# 芯片信息：芯片粘接材料
+_CHIP_MATERIAL_PATTERNS = _FieldPatterns([
+    r"芯片粘接材料[为是]([^，。；]+)",
+    r"粘接材料[为是]([^，。；]+)",
+    r"采用([^，。；]+)粘接芯片",
+    r"芯片采用([^，。；]+)粘接"
+])
+
+# 芯片信息：芯片安装工艺
+_CHIP_PROCESS_PATTERNS = _FieldPatterns([
+    r"芯片安装工艺[为是采用]([^，。；]+)",
+    r"安装工艺[为是]([^，。；]+)",
+    r"芯片安装采用([^，。；]+)",
+    r"采用([^，。；]+)安装芯片"
+])
+
+# 芯片信息：芯片结构和工艺
+_CHIP_TECH_PATTERNS = _FieldPatterns([
+    r"芯片结构[为是采用]([^，。；]+)",
+    r"芯片[^，。；]*工艺[为是]([^，。；]+)",
+    r"结构和工艺[为是]([^，。；]+)",
+    r"芯片采用([^，。；]+)工艺"
+])
+
+# 键合信息：键合结构
+_BONDING_STRUCTURE_PATTERNS = _FieldPatterns([
+    r"键合结构[为是]([^，。；]+)",
+    r"键合[为是]([^，。；]*结构[^，。；]*)",
+    r"([^，。；]+)结构[^，。；]*键合",
+    r"采用([^，。；]+)键合结构"
+])
+
+# 键合信息：键合丝材料
+_BONDING_MATERIAL_PATTERNS = _FieldPatterns([
+    r"键合丝[为是材料]([^，。；]+)",
+    r"键合材料[为是]([^，。；]+)",
+    r"采用([^，。；]+)键合丝",
+    r"([^，。；]+)丝[^，。；]*键合"
+])
+
+# 键合信息：键合工艺
+_BONDING_PROCESS_PATTERNS = _FieldPatterns([
+    r"键合工艺[为是采用]([^，。；]+)",
+    r"键合采用([^，。；]+)工艺",
+    r"采用([^，。；]+)键合工艺",
+    r"工艺[为是]([^，。；]*键合[^，。；]*)"
+])
+
+# 键合信息：键合质量评估
+_BONDING_QUALITY_PATTERNS = _FieldPatterns([
+    r"键合质量[为是]([^，。；]+)",
+    r"键合[^，。；]*评估[为是]([^，。；]+)",
+    r"质量评估[为是]([^，。；]*键合[^，。；]*)",
+    r"键合[^，。；]*质量([^，。；]+)"
+])
+
+
 class InformationExtractor(BaseExtractor):
     """信息抽取类，负责从文本中提取关键信息"""
     
@@ -27,6 +409,10 @@ class InformationExtractor(BaseExtractor):
         self.relation_model = None
         self.tokenizer = None
         self.ner_pipeline = None
+        # 量化后的ONNX模型（存在时优先使用）
+        self.ner_session = None
+        self.ner_labels = None
+        self.relation_session = None
         
         # 加载停用词
         self.stopwords = self._load_stopwords()
@@ -37,22 +423,40 @@ class InformationExtractor(BaseExtractor):
         # 如果指定了模型路径且use_models为True，则加载模型
         if use_models and ner_model_path and relation_model_path:
             try:
-                # 加载命名实体识别模型
+                # CUDA内核延迟到首次使用时加载，缩短torch初始化时间（已设置时不覆盖）
+                os.environ.setdefault("CUDA_MODULE_LOADING", "LAZY")
+                # transformers（及其依赖的torch）导入耗时且占用大量内存，只在使用模型时导入
+                from transformers import AutoConfig, AutoTokenizer, AutoModelForTokenClassification, \
+                    AutoModelForSequenceClassification, pipeline
+                
                 self.tokenizer = AutoTokenizer.from_pretrained(ner_model_path)
-                self.ner_model = AutoModelForTokenClassification.from_pretrained(ner_model_path)
+                
+                # 优先加载量化后的ONNX模型，不存在时加载PyTorch模型
+                self.ner_session = _load_onnx_model(ner_model_path)
+                self.relation_session = _load_onnx_model(relation_model_path)
+                
+                # 加载命名实体识别模型
+                if self.ner_session is not None:
+                    self.ner_labels = AutoConfig.from_pretrained(ner_model_path).id2label
+                else:
+                    self.ner_model = _prepare_torch_model(AutoModelForTokenClassification.from_pretrained(
+                        ner_model_path, **_pretrained_load_kwargs()))
+                    # 创建NER流水线
+                    self.ner_pipeline = pipeline("ner", model=self.ner_model, tokenizer=self.tokenizer,
+                                                 device=self.ner_model.device)
                 
                 # 加载关系抽取模型
-                self.relation_model = AutoModelForSequenceClassification.from_pretrained(relation_model_path)
+                if self.relation_session is None:
+                    self.relation_model = _prepare_torch_model(AutoModelForSequenceClassification.from_pretrained(
+                        relation_model_path, **_pretrained_load_kwargs()))
                 
-                # 创建NER流水线
-                self.ner_pipeline = pipeline("ner", model=self.ner_model, tokenizer=self.tokenizer)
-                print("成功加载NER和关系抽取模型")
+                print("成功加载NER和关系抽取模型" + ("（ONNX）" if self.ner_session or self.relation_session else ""))
             except Exception as e:
                 print(f"加载模型失败: {e}")
                 print("将使用规则提取")
                 self.use_models = False
     
-    def _load_stopwords(self) -> Set[str]:
+    def _load_stopwords(self) -> FrozenSet[str]:
         """加载停用词表"""
         stopwords = set()
         try:
@@ -66,7 +470,7 @@ class InformationExtractor(BaseExtractor):
             # 使用一些基本的停用词
             stopwords = set(['的', '了', '和', '与', '或', '是', '在', '有', '为', '以', '及', '等', '对', '中'])
         
-        return stopwords
+        return frozenset(stopwords)
     
     def load_custom_dict(self):
         """加载自定义词典"""
@@ -89,22 +493,8 @@ class InformationExtractor(BaseExtractor):
         Returns:
             分句后的文本列表
         """
-        # 分句规则
-        patterns = [
-            r'([。！？\?])([^\"\'])',
-            r'(\.{6})([^\"\'])',
-            r'(\…{2})([^\"\'])',
-            r'([。！？\?][\"\'])([^，。！？\?])'
-        ]
-        
-        # 应用分句规则
-        for pattern in patterns:
-            text = re.sub(pattern, r'\1\n\2', text)
-        
-        # 分割成句子
-        sentences = text.rstrip().split('\n')
-        
-        return sentences
+        # 返回列表副本，调用方修改结果时不会影响缓存
+        return list(_segment_sentences(text))
     
     def extract_entities(self, text: str) -> List[Dict[str, Any]]:
         """
@@ -116,27 +506,24 @@ class InformationExtractor(BaseExtractor):
         Returns:
             实体列表
         """
-        if self.use_models and self.ner_pipeline:
-            # 使用模型提取实体
-            results = self.ner_pipeline(text)
+        if self.use_models and (self.ner_session or self.ner_pipeline):
+            # 使用模型提取实体：按句子分批送入模型，一次前向计算处理多个句子
+            spans = [(start, sentence) for start, sentence in self._sentence_spans(text) if sentence.strip()]
+            if not spans:
+                return []
+            sentences = [sentence for _, sentence in spans]
+            if self.ner_session:
+                batch_results = self._run_onnx_ner(sentences)
+            else:
+                batch_results = self.ner_pipeline(sentences, batch_size=_NER_BATCH_SIZE)
             
-            # 合并分词后的实体
+            # 逐句合并分词后的实体，并将位置换算为全文中的位置
             entities = []
-            current_entity = None
-            
-            for item in results:
-                if current_entity and current_entity["entity"] != item["entity"]:
-                    entities.append(current_entity)
-                    current_entity = None
-                
-                if current_entity:
-                    current_entity["word"] += item["word"].replace("##", "")
-                    current_entity["end"] = item["end"]
-                else:
-                    current_entity = item.copy()
-                
-            if current_entity:
-                entities.append(current_entity)
+            for (sentence_start, _), results in zip(spans, batch_results):
+                for entity in self._merge_ner_tokens(results):
+                    entity["start"] += sentence_start
+                    entity["end"] += sentence_start
+                    entities.append(entity)
             
             return entities
         else:
@@ -147,14 +534,19 @@ class InformationExtractor(BaseExtractor):
             for sentence in sentences:
                 # 使用jieba进行分词和词性标注
                 words = pseg.cut(sentence)
+                # 分词结果按顺序覆盖整个句子，记录当前位置，从该位置查找词语，无需每次从句首查找
+                cursor = 0
                 
                 for word, flag in words:
+                    start = sentence.find(word, cursor)
+                    if start != -1:
+                        cursor = start + len(word)
+                    
                     if word in self.stopwords or word.isspace():
                         continue
                     
                     # 根据词性判断是否为实体
                     if flag in ['n', 'nz', 'nr', 'ns', 'nt', 'x']:
-                        start = sentence.find(word)
                         if start != -1:
                             entities.append({
                                 "word": word,
@@ -165,6 +557,71 @@ class InformationExtractor(BaseExtractor):
             
             return entities
     
+    def _merge_ner_tokens(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """合并分词后的实体（相邻且标签相同的token合并为一个实体）"""
+        entities = []
+        current_entity = None
+        
+        for item in results:
+            if current_entity and current_entity["entity"] != item["entity"]:
+                entities.append(current_entity)
+                current_entity = None
+            
+            if current_entity:
+                current_entity["word"] += item["word"].replace("##", "")
+                current_entity["end"] = item["end"]
+            else:
+                current_entity = item.copy()
+            
+        if current_entity:
+            entities.append(current_entity)
+        
+        return entities
+    
+    def _run_onnx_ner(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        使用ONNX模型批量进行逐token的实体识别，输出格式与transformers的ner流水线相同
+        
+        Args:
+            texts: 输入文本列表
+            
+        Returns:
+            每个文本对应的非"O"标签的token列表
+        """
+        all_results = []
+        for batch_start in range(0, len(texts), _NER_BATCH_SIZE):
+            batch = texts[batch_start:batch_start + _NER_BATCH_SIZE]
+            encoding = self.tokenizer(batch, padding=True, truncation=True, return_offsets_mapping=True,
+                                      return_tensors="np")
+            batch_offsets = encoding.pop("offset_mapping")
+            logits = self.ner_session(encoding)
+            
+            # softmax得到每个token的标签概率
+            probabilities = np.exp(logits - logits.max(axis=-1, keepdims=True))
+            probabilities /= probabilities.sum(axis=-1, keepdims=True)
+            batch_label_ids = probabilities.argmax(axis=-1)
+            
+            for row, (label_ids, offsets) in enumerate(zip(batch_label_ids, batch_offsets)):
+                tokens = self.tokenizer.convert_ids_to_tokens(encoding["input_ids"][row])
+                results = []
+                for index, (label_id, (start, end)) in enumerate(zip(label_ids, offsets)):
+                    # 跳过[CLS]、[SEP]、填充等特殊token
+                    if start == end:
+                        continue
+                    label = self.ner_labels[int(label_id)]
+                    if label == "O":
+                        continue
+                    results.append({
+                        "entity": label,
+                        "score": float(probabilities[row, index, label_id]),
+                        "index": index,
+                        "word": tokens[index],
+                        "start": int(start),
+                        "end": int(end)
+                    })
+                all_results.append(results)
+        return all_results
+    
     def extract_relations(self, text: str, entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         提取实体间关系
@@ -176,76 +633,125 @@ class InformationExtractor(BaseExtractor):
         Returns:
             关系列表
         """
-        if self.use_models and self.relation_model and self.tokenizer:
+        if self.use_models and (self.relation_session or self.relation_model) and self.tokenizer:
             # 使用模型提取关系
             relations = []
             
-            # 对实体对进行关系分类
-            for i, e1 in enumerate(entities):
-                for j, e2 in enumerate(entities):
-                    if i != j:
-                        # 构造输入
-                        inputs = self.tokenizer(
-                            text,
-                            text.replace(e1["word"], f"[E1]{e1['word']}[/E1]").replace(e2["word"], f"[E2]{e2['word']}[/E2]"),
-                            return_tensors="pt"
-                        )
-                        
-                        # 预测关系
-                        with torch.no_grad():
-                            outputs = self.relation_model(**inputs)
-                            predicted_class = outputs.logits.argmax().item()
-                        
-                        # 如果预测为有关系
-                        if predicted_class != 0:  # 假设0表示"无关系"
-                            relations.append({
-                                "head": e1,
-                                "tail": e2,
-                                "relation_type": predicted_class  # 实际应用中应映射到具体关系标签
-                            })
+            # 只对同一句子中的实体对进行关系分类，避免对全文所有实体两两组合
+            candidates = []
+            for sentence, sentence_entities in self._group_entities_by_sentence(text, entities):
+                for e1 in sentence_entities:
+                    for e2 in sentence_entities:
+                        if e1 is not e2:
+                            marked = sentence.replace(e1["word"], f"[E1]{e1['word']}[/E1]") \
+                                .replace(e2["word"], f"[E2]{e2['word']}[/E2]")
+                            candidates.append((e1, e2, sentence, marked))
+            
+            # 分批构造输入，每批只做一次前向计算
+            for start in range(0, len(candidates), _RELATION_BATCH_SIZE):
+                batch = candidates[start:start + _RELATION_BATCH_SIZE]
+                inputs = self.tokenizer(
+                    [sentence for _, _, sentence, _ in batch],
+                    [marked for _, _, _, marked in batch],
+                    padding=True,
+                    truncation=True,
+                    return_tensors="np" if self.relation_session else "pt"
+                )
+                
+                # 预测关系
+                if self.relation_session:
+                    predicted_classes = self.relation_session(inputs).argmax(axis=-1).tolist()
+                else:
+                    import torch
+                    
+                    # inference_mode比no_grad更进一步省去了张量版本计数等自动求导记录
+                    with torch.inference_mode():
+                        outputs = self.relation_model(**inputs.to(self.relation_model.device))
+                        predicted_classes = outputs.logits.argmax(dim=-1).tolist()
+                
+                for (e1, e2, _, _), predicted_class in zip(batch, predicted_classes):
+                    # 如果预测为有关系
+                    if predicted_class != 0:  # 假设0表示"无关系"
+                        relations.append({
+                            "head": e1,
+                            "tail": e2,
+                            "relation_type": predicted_class  # 实际应用中应映射到具体关系标签
+                        })
             
             return relations
         else:
             # 使用规则提取关系
             relations = []
             sentences = self.segment_text(text)
-            
-            # 定义关系模式
-            relation_patterns = {
-                "包含": r'(.+)包[含括](.+)',
-                "采用": r'(.+)采用(.+)',
-                "为": r'(.+)为(.+)',
-                "是": r'(.+)是(.+)',
-                "具有": r'(.+)具有(.+)',
-                "属于": r'(.+)属于(.+)'
-            }
+            # 实体索引每次调用只构建一次，供所有句子的头尾文本查找
+            entity_index = _build_entity_index(entities)
             
             for sentence in sentences:
-                for relation_type, pattern in relation_patterns.items():
-                    matches = re.finditer(pattern, sentence)
-                    for match in matches:
-                        head_text = match.group(1).strip()
-                        tail_text = match.group(2).strip()
-                        
-                        # 查找匹配的实体
-                        head_entity = None
-                        tail_entity = None
-                        
-                        for entity in entities:
-                            if entity["word"] in head_text:
-                                head_entity = entity
-                            if entity["word"] in tail_text:
-                                tail_entity = entity
-                        
-                        if head_entity and tail_entity:
-                            relations.append({
-                                "head": head_entity,
-                                "tail": tail_entity,
-                                "relation_type": relation_type
-                            })
+                for relation_type, keywords in _RELATION_TRIGGERS:
+                    split = _split_on_trigger(sentence, keywords)
+                    if split is None:
+                        continue
+                    head_text = split[0].strip()
+                    tail_text = split[1].strip()
+                    
+                    # 查找匹配的实体（多个实体匹配时取实体列表中最靠后的一个）
+                    head_entity = _last_contained_entity(head_text, entity_index)
+                    if head_entity is None:
+                        continue
+                    tail_entity = _last_contained_entity(tail_text, entity_index)
+                    
+                    if head_entity and tail_entity:
+                        relations.append({
+                            "head": head_entity,
+                            "tail": tail_entity,
+                            "relation_type": relation_type
+                        })
             
             return relations
     
+    def _sentence_spans(self, text: str) -> List[Tuple[int, str]]:
+        """
+        分句并计算每个句子在全文中的起始位置
+        
+        Args:
+            text: 输入文本
+            
+        Returns:
+            [(起始位置, 句子), ...]
+        """
+        spans = []
+        position = 0
+        for sentence in self.segment_text(text):
+            start = text.find(sentence, position)
+            if start == -1:
+                continue
+            spans.append((start, sentence))
+            position = start + len(sentence)
+        return spans
+    
+    def _group_entities_by_sentence(self, text: str, entities: List[Dict[str, Any]]) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        按实体在全文中的起始位置将实体分配到所在的句子
+        
+        Args:
+            text: 输入文本
+            entities: 实体列表（start为实体在全文中的起始位置）
+            
+        Returns:
+            [(句子, 句中实体列表), ...]，只包含至少有两个实体的句子
+        """
+        spans = self._sentence_spans(text)
+        sentences = [sentence for _, sentence in spans]
+        sentence_starts = [start for start, _ in spans]
+        
+        grouped = [[] for _ in sentences]
+        for entity in entities:
+            index = bisect.bisect_right(sentence_starts, entity.get("start", 0)) - 1
+            if index >= 0:
+                grouped[index].append(entity)
+        
+        return [(sentence, group) for sentence, group in zip(sentences, grouped) if len(group) > 1]
+    
     def extract_info(self, text: str, section_type: str) -> Dict[str, Any]:
         """
         根据章节类型提取关键信息
@@ -290,87 +796,32 @@ class InformationExtractor(BaseExtractor):
         }
         
         # 型号规格提取
-        model_patterns = [
-            r"型号规格[（\(]([^）\)]+)[）\)]",
-            r"型号规格为([^，。；]+)",
-            r"器件型号[为是]([^，。；]+)",
-            r"器件型号规格为([^，。；]+)"
-        ]
-        
-        for pattern in model_patterns:
-            model_match = re.search(pattern, text)
-            if model_match:
-                info["型号规格"] = model_match.group(1).strip()
-                break
+        model_match = _IDENTIFICATION_MODEL_PATTERNS.search(text)
+        if model_match:
+            info["型号规格"] = model_match.group(1).strip()
         
         # 生产批次提取
-        batch_patterns = [
-            r"生产批次[（\(]([^）\)]+)[）\)]",
-            r"生产批次为([^，。；]+)",
-            r"批次[为号]([^，。；]+)",
-            r"生产批[号次][为是]([^，。；]+)"
-        ]
-        
-        for pattern in batch_patterns:
-            batch_match = re.search(pattern, text)
-            if batch_match:
-                info["生产批次"] = batch_match.group(1).strip()
-                break
+        batch_match = _IDENTIFICATION_BATCH_PATTERNS.search(text)
+        if batch_match:
+            info["生产批次"] = batch_match.group(1).strip()
         
         # 生产厂标识提取
-        vendor_patterns = [
-            r"生产厂标识[（\(]([^）\)]+)[）\)]",
-            r"生产厂标识为([^，。；]+)",
-            r"厂家标识[为是]([^，。；]+)",
-            r"生产厂[为是]([^，。；]+)"
-        ]
-        
-        for pattern in vendor_patterns:
-            vendor_match = re.search(pattern, text)
-            if vendor_match:
-                info["生产厂标识"] = vendor_match.group(1).strip()
-                break
+        vendor_match = _IDENTIFICATION_VENDOR_PATTERNS.search(text)
+        if vendor_match:
+            info["生产厂标识"] = vendor_match.group(1).strip()
         
         # 标识方式提取
-        method_patterns = [
-            r"器件采用([\S]+)方式打标",
-            r"标识采用([\S]+)方式",
-            r"采用([\S]+)[打印刻]标",
-            r"标识方式[为是]([\S]+)"
-        ]
-        
-        for pattern in method_patterns:
-            method_match = re.search(pattern, text)
-            if method_match:
-                info["标识方式"] = method_match.group(1).strip()
-                break
+        method_match = _IDENTIFICATION_METHOD_PATTERNS.search(text)
+        if method_match:
+            info["标识方式"] = method_match.group(1).strip()
         
         # 标识牢固度评估
-        durability_patterns = [
-            r"标识牢固度([^，。；]+)",
-            r"标识牢固[性度][为是]([^，。；]+)",
-            r"标识[为是]([^，。；]*牢固[^，。；]*)"
-        ]
-        
-        for pattern in durability_patterns:
-            durability_match = re.search(pattern, text)
-            if durability_match:
-                info["标识牢固度"] = durability_match.group(1).strip()
-                break
+        durability_match = _IDENTIFICATION_DURABILITY_PATTERNS.search(text)
+        if durability_match:
+            info["标识牢固度"] = durability_match.group(1).strip()
         
         # 问题与建议提取
-        suggestion_patterns = [
-            r"建议([^。；]+)",
-            r"存在[的]?问题[：:]([^。；]+)",
-            r"缺少([^，。；]+)",
-            r"问题[为是]([^。；]+)"
-        ]
-        
-        for pattern in suggestion_patterns:
-            for match in re.finditer(pattern, text):
-                suggestion = match.group(1).strip()
-                if suggestion and suggestion not in info["问题与建议"]:
-                    info["问题与建议"].append(suggestion)
+        info["问题与建议"] = self._extract_suggestions(text)
         
         # 处理未提取到的字段
         for key in info:
@@ -397,64 +848,28 @@ class InformationExtractor(BaseExtractor):
         }
         
         # 封装类型提取
-        type_patterns = [
-            r"器件采用([A-Z0-9]+[^，。；]*)[封装]",
-            r"封装类型[为是]([^，。；]+)",
-            r"采用([^，。；]+)封装",
-            r"([A-Z0-9]+\d+[A-Z]*)[^，。；]*封装"
-        ]
-        
-        for pattern in type_patterns:
-            type_match = re.search(pattern, text)
-            if type_match:
-                info["封装类型"] = type_match.group(1).strip()
-                break
+        type_match = _PACKAGE_TYPE_PATTERNS.search(text)
+        if type_match:
+            info["封装类型"] = type_match.group(1).strip()
         
         # 封装材料提取
-        material_patterns = [
-            r"封装材料[为包括含]([^，。；]+)",
-            r"封装材料主要包括([^，。；]+)",
-            r"材料[为包括含]([^，。；]+)",
-            r"([^，。；]+材料[为是][^，。；]+)"
-        ]
-        
-        for pattern in material_patterns:
-            material_match = re.search(pattern, text)
-            if material_match:
-                materials_text = material_match.group(1).strip()
-                # 分割多个材料
-                materials = [m.strip() for m in re.split(r'[、和及]', materials_text) if m.strip()]
-                if materials:
-                    info["封装材料"] = materials
-                break
+        material_match = _PACKAGE_MATERIAL_PATTERNS.search(text)
+        if material_match:
+            materials_text = material_match.group(1).strip()
+            # 分割多个材料
+            materials = [m.strip() for m in _MATERIAL_SPLIT_RE.split(materials_text) if m.strip()]
+            if materials:
+                info["封装材料"] = materials
         
         # 封装工艺提取
-        process_patterns = [
-            r"封装工艺[为是采用]([^，。；]+)",
-            r"采用([^，。；]+)工艺",
-            r"工艺[为是]([^，。；]+)",
-            r"([^，。；]+)[工艺技术][^，。；]*封装"
-        ]
-        
-        for pattern in process_patterns:
-            process_match = re.search(pattern, text)
-            if process_match:
-                info["封装工艺"] = process_match.group(1).strip()
-                break
+        process_match = _PACKAGE_PROCESS_PATTERNS.search(text)
+        if process_match:
+            info["封装工艺"] = process_match.group(1).strip()
         
         # 质量评估提取
-        quality_patterns = [
-            r"质量评估[为是]([^，。；]+)",
-            r"工艺质量[为是]([^，。；]+)",
-            r"质量[为是]([^，。；]+)",
-            r"评估[为是]([^，。；]+)"
-        ]
-        
-        for pattern in quality_patterns:
-            quality_match = re.search(pattern, text)
-            if quality_match:
-                info["质量评估"] = quality_match.group(1).strip()
-                break
+        quality_match = _PACKAGE_QUALITY_PATTERNS.search(text)
+        if quality_match:
+            info["质量评估"] = quality_match.group(1).strip()
         
         # 处理未提取到的字段
         for key in info:
@@ -484,74 +899,27 @@ class InformationExtractor(BaseExtractor):
         }
         
         # 芯片装配结构提取
-        structure_patterns = [
-            r"芯片装配结构[为是]([^，。；]+)",
-            r"芯片[为是]([^，。；]*结构[^，。；]*)",
-            r"装配结构[为是]([^，。；]+)",
-            r"([^，。；]+)结构[^，。；]*芯片"
-        ]
-        
-        for pattern in structure_patterns:
-            structure_match = re.search(pattern, text)
-            if structure_match:
-                info["芯片装配结构"] = structure_match.group(1).strip()
-                break
+        structure_match = _CHIP_STRUCTURE_PATTERNS.search(text)
+        if structure_match:
+            info["芯片装配结构"] = structure_match.group(1).strip()
         
         # 芯片粘接材料提取
-        material_patterns = [
-            r"芯片粘接材料[为是]([^，。；]+)",
-            r"粘接材料[为是]([^，。；]+)",
-            r"采用([^，。；]+)粘接芯片",
-            r"芯片采用([^，。；]+)粘接"
-        ]
-        
-        for pattern in material_patterns:
-            material_match = re.search(pattern, text)
-            if material_match:
-                info["芯片粘接材料"] = material_match.group(1).strip()
-                break
+        material_match = _CHIP_MATERIAL_PATTERNS.search(text)
+        if material_match:
+            info["芯片粘接材料"] = material_match.group(1).strip()
         
         # 芯片安装工艺提取
-        process_patterns = [
-            r"芯片安装工艺[为是采用]([^，。；]+)",
-            r"安装工艺[为是]([^，。；]+)",
-            r"芯片安装采用([^，。；]+)",
-            r"采用([^，。；]+)安装芯片"
-        ]
-        
-        for pattern in process_patterns:
-            process_match = re.search(pattern, text)
-            if process_match:
-                info["芯片安装工艺"] = process_match.group(1).strip()
-                break
+        process_match = _CHIP_PROCESS_PATTERNS.search(text)
+        if process_match:
+            info["芯片安装工艺"] = process_match.group(1).strip()
         
         # 芯片结构和工艺提取
-        tech_patterns = [
-            r"芯片结构[为是采用]([^，。；]+)",
-            r"芯片[^，。；]*工艺[为是]([^，。；]+)",
-            r"结构和工艺[为是]([^，。；]+)",
-            r"芯片采用([^，。；]+)工艺"
-        ]
-        
-        for pattern in tech_patterns:
-            tech_match = re.search(pattern, text)
-            if tech_match:
-                info["芯片结构和工艺"] = tech_match.group(1).strip()
-                break
+        tech_match = _CHIP_TECH_PATTERNS.search(text)
+        if tech_match:
+            info["芯片结构和工艺"] = tech_match.group(1).strip()
         
         # 问题与建议提取
-        suggestion_patterns = [
-            r"建议([^。；]+)",
-            r"存在[的]?问题[：:]([^。；]+)",
-            r"缺少([^，。；]+)",
-            r"问题[为是]([^。；]+)"
-        ]
-        
-        for pattern in suggestion_patterns:
-            for match in re.finditer(pattern, text):
-                suggestion = match.group(1).strip()
-                if suggestion and suggestion not in info["问题与建议"]:
-                    info["问题与建议"].append(suggestion)
+        info["问题与建议"] = self._extract_suggestions(text)
         
         # 处理未提取到的字段
         for key in info:
@@ -579,74 +947,27 @@ class InformationExtractor(BaseExtractor):
         }
         
         # 键合结构提取
-        structure_patterns = [
-            r"键合结构[为是]([^，。；]+)",
-            r"键合[为是]([^，。；]*结构[^，。；]*)",
-            r"([^，。；]+)结构[^，。；]*键合",
-            r"采用([^，。；]+)键合结构"
-        ]
-        
-        for pattern in structure_patterns:
-            structure_match = re.search(pattern, text)
-            if structure_match:
-                info["键合结构"] = structure_match.group(1).strip()
-                break
+        structure_match = _BONDING_STRUCTURE_PATTERNS.search(text)
+        if structure_match:
+            info["键合结构"] = structure_match.group(1).strip()
         
         # 键合丝材料提取
-        material_patterns = [
-            r"键合丝[为是材料]([^，。；]+)",
-            r"键合材料[为是]([^，。；]+)",
-            r"采用([^，。；]+)键合丝",
-            r"([^，。；]+)丝[^，。；]*键合"
-        ]
-        
-        for pattern in material_patterns:
-            material_match = re.search(pattern, text)
-            if material_match:
-                info["键合丝材料"] = material_match.group(1).strip()
-                break
+        material_match = _BONDING_MATERIAL_PATTERNS.search(text)
+        if material_match:
+            info["键合丝材料"] = material_match.group(1).strip()
         
         # 键合工艺提取
-        process_patterns = [
-            r"键合工艺[为是采用]([^，。；]+)",
-            r"键合采用([^，。；]+)工艺",
-            r"采用([^，。；]+)键合工艺",
-            r"工艺[为是]([^，。；]*键合[^，。；]*)"
-        ]
-        
-        for pattern in process_patterns:
-            process_match = re.search(pattern, text)
-            if process_match:
-                info["键合工艺"] = process_match.group(1).strip()
-                break
+        process_match = _BONDING_PROCESS_PATTERNS.search(text)
+        if process_match:
+            info["键合工艺"] = process_match.group(1).strip()
         
         # 键合质量评估提取
-        quality_patterns = [
-            r"键合质量[为是]([^，。；]+)",
-            r"键合[^，。；]*评估[为是]([^，。；]+)",
-            r"质量评估[为是]([^，。；]*键合[^，。；]*)",
-            r"键合[^，。；]*质量([^，。；]+)"
-        ]
-        
-        for pattern in quality_patterns:
-            quality_match = re.search(pattern, text)
-            if quality_match:
-                info["键合质量评估"] = quality_match.group(1).strip()
-                break
+        quality_match = _BONDING_QUALITY_PATTERNS.search(text)
+        if quality_match:
+            info["键合质量评估"] = quality_match.group(1).strip()
         
         # 问题与建议提取
-        suggestion_patterns = [
-            r"建议([^。；]+)",
-            r"存在[的]?问题[：:]([^。；]+)",
-            r"缺少([^，。；]+)",
-            r"问题[为是]([^。；]+)"
-        ]
-        
-        for pattern in suggestion_patterns:
-            for match in re.finditer(pattern, text):
-                suggestion = match.group(1).strip()
-                if suggestion and suggestion not in info["问题与建议"]:
-                    info["问题与建议"].append(suggestion)
+        info["问题与建议"] = self._extract_suggestions(text)
         
         # 处理未提取到的字段
         for key in info:
@@ -688,24 +1009,29 @@ class InformationExtractor(BaseExtractor):
         info["关键词"] = keywords
         
         # 提取问题与建议
-        suggestions = []
-        suggestion_patterns = [
-            r"建议([^。；]+)",
-            r"存在[的]?问题[：:]([^。；]+)",
-            r"缺少([^，。；]+)",
-            r"问题[为是]([^。；]+)"
-        ]
-        
-        for pattern in suggestion_patterns:
-            for match in re.finditer(pattern, text):
-                suggestion = match.group(1).strip()
-                if suggestion and suggestion not in suggestions:
-                    suggestions.append(suggestion)
-        
-        info["问题与建议"] = suggestions
+        info["问题与建议"] = self._extract_suggestions(text)
         
         return info
     
+    def _extract_suggestions(self, text: str) -> List[str]:
+        """
+        提取文本中的问题与建议（各章节通用）
+        
+        Args:
+            text: 输入文本
+            
+        Returns:
+            去重后的问题与建议列表，按模式顺序和出现顺序排列
+        """
+        # dict保持插入顺序，用于O(1)去重
+        suggestions = {}
+        for pattern in _SUGGESTION_PATTERNS:
+            for match in pattern.finditer(text):
+                suggestion = match.group(1).strip()
+                if suggestion:
+                    suggestions[suggestion] = None
+        return list(suggestions)
+    
     def _extract_keywords(self, text: str, top_n: int = 10) -> List[str]:
         """
         提取文本中的关键词
@@ -717,22 +1043,8 @@ class InformationExtractor(BaseExtractor):
         Returns:
             关键词列表
         """
-        # 分词
-        words = jieba.cut(text)
-        
-        # 过滤停用词
-        filtered_words = [word for word in words if word not in self.stopwords and len(word) > 1]
-        
-        # 统计词频
-        word_freq = {}
-        for word in filtered_words:
-            if word in word_freq:
-                word_freq[word] += 1
-            else:
-                word_freq[word] = 1
-        
-        # 按词频排序
-        sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
+        # 分词，过滤停用词后统计词频
+        word_freq = Counter(word for word in jieba.lcut(text) if len(word) > 1 and word not in self.stopwords)
         
-        # 返回前top_n个关键词
-        return [word for word, _ in sorted_words[:top_n]] 
\ No newline at end of file
+        # 返回词频最高的top_n个关键词（词频相同时保持首次出现的顺序）
+        return [word for word, _ in word_freq.most_common(top_n)] 
\ No newline at end of file
@@ -1,5 +1,8 @@
 import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
@@ -9,13 +12,26 @@ from sqlalchemy import text
 from app.api import api_router
 from app.core.config import settings
 from app.db import engine, Base, get_db
+from app.api.deps import get_llm_extractor, close_llm_singletons
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
 
+# 健康检查语句只构造一次，每次检查直接复用
+_HEALTH_CHECK_STMT = text("SELECT 1")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时创建LLM提取器单例，避免首批提取请求承担初始化开销（初始化是同步的，放到线程池中执行）
+    await run_in_threadpool(get_llm_extractor)
+    yield
+    # 关闭时释放提取器持有的后台事件循环和HTTP连接（会等待后台线程退出）
+    await run_in_threadpool(close_llm_singletons)
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # 设置CORS
@@ -51,7 +67,7 @@ def read_root():
 def health_check(db: Session = Depends(get_db)):
     try:
         # 尝试执行一个简单的数据库查询
-        db.execute(text("SELECT 1"))
+        db.execute(_HEALTH_CHECK_STMT)
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         return {"status": "unhealthy", "database": f"error: {str(e)}"} 
\ No newline at end of file
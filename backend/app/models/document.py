@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -10,7 +10,7 @@ class Document(Base):
     __tablename__ = "documents"
     
     id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String(255), nullable=False)
+    filename = Column(String(255), nullable=False, unique=True)  # 唯一的存储文件名（UUID）
     original_filename = Column(String(255), nullable=False)
     file_path = Column(String(512), nullable=False)
     file_size = Column(Integer, nullable=False)  # 文件大小（字节）
@@ -25,5 +25,12 @@ class Document(Base):
     # 关联修改历史
     edit_histories = relationship("EditHistory", back_populates="document", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # 文档列表按(上传时间, ID)倒序分页，游标分页时每页只需在索引上做一次范围扫描
+        Index('idx_doc_time_id', 'upload_time', 'id'),
+        # 按上传时间取出未处理文档（批量处理队列），等值列processed在前
+        Index('idx_doc_processed_time', 'processed', 'upload_time'),
+    )
+    
     def __repr__(self):
         return f"<Document(id={self.id}, filename={self.filename})>" 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -23,5 +23,10 @@ class EditHistory(Base):
     # 关联文档
     document = relationship("Document", back_populates="edit_histories")
     
+    __table_args__ = (
+        # 按文档查询编辑历史并按编辑时间排序/过滤，ID作为同一时间内的排序键，支持游标分页
+        Index('idx_edit_doc_time', 'document_id', 'edit_time', 'id'),
+    )
+    
     def __repr__(self):
         return f"<EditHistory(id={self.id}, document_id={self.document_id}, field_name={self.field_name})>" 
\ No newline at end of file
@@ -1,4 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON
+import json
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -10,9 +13,9 @@ class ExtractionResult(Base):
     __tablename__ = "extraction_results"
     
     id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
     extraction_time = Column(DateTime, default=datetime.now)
-    result_json = Column(JSON, nullable=False)  # 存储提取结果的JSON
+    result_json = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)  # 存储提取结果的JSON（PostgreSQL上使用二进制的JSONB）
     is_edited = Column(Boolean, default=False)  # 是否经过编辑
     last_edit_time = Column(DateTime, nullable=True)  # 最后编辑时间
     
@@ -22,6 +25,18 @@ class ExtractionResult(Base):
     # 关联物理状态组
     physical_state_groups = relationship("PhysicalStateGroup", back_populates="extraction_result", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # PostgreSQL上为提取结果JSON建立GIN索引，支持按JSON内容查询（其他数据库不支持直接索引JSON列）
+        Index('idx_er_result_json_gin', 'result_json', postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+    
+    @property
+    def result_data(self):
+        """提取结果字典，兼容早期以JSON字符串形式存储的记录"""
+        if isinstance(self.result_json, str):
+            return json.loads(self.result_json)
+        return self.result_json
+    
     def __repr__(self):
         return f"<ExtractionResult(id={self.id}, document_id={self.document_id})>"
 
@@ -40,6 +55,11 @@ class PhysicalStateGroup(Base):
     # 关联物理状态项
     physical_state_items = relationship("PhysicalStateItem", back_populates="physical_state_group", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # 按提取结果加载物理状态组、按组名查找组，外键列在前，单独按外键查询时也能使用该索引
+        Index('idx_psg_result_group', 'extraction_result_id', 'group_name'),
+    )
+    
     def __repr__(self):
         return f"<PhysicalStateGroup(id={self.id}, group_name={self.group_name})>"
 
@@ -59,5 +79,10 @@ class PhysicalStateItem(Base):
     # 关联物理状态组
     physical_state_group = relationship("PhysicalStateGroup", back_populates="physical_state_items")
     
+    __table_args__ = (
+        # 按物理状态组加载物理状态项、按名称查找项，外键列在前，单独按外键查询时也能使用该索引
+        Index('idx_psi_group_state', 'physical_state_group_id', 'state_name'),
+    )
+    
     def __repr__(self):
         return f"<PhysicalStateItem(id={self.id}, state_name={self.state_name})>" 
\ No newline at end of file
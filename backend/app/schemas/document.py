@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class DocumentBase(BaseModel):
@@ -25,8 +25,7 @@ class DocumentResponse(DocumentBase):
     upload_time: datetime
     processing_time: Optional[float] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class DocumentListResponse(BaseModel):
@@ -39,8 +38,7 @@ class DocumentListResponse(BaseModel):
     processed: bool
     processing_time: Optional[float] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class BatchUploadResponse(BaseModel):
@@ -49,8 +47,7 @@ class BatchUploadResponse(BaseModel):
     successful: int  # 成功上传的文件数
     documents: List[DocumentResponse]  # 成功上传的文档列表
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class BatchDeleteRequest(BaseModel):
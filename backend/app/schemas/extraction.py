@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class PhysicalStateItemBase(BaseModel):
@@ -16,8 +16,7 @@ class PhysicalStateItemResponse(PhysicalStateItemBase):
     id: int
     physical_state_group_id: int
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class PhysicalStateGroupBase(BaseModel):
@@ -31,8 +30,7 @@ class PhysicalStateGroupResponse(PhysicalStateGroupBase):
     extraction_result_id: int
     items: List[PhysicalStateItemResponse] = []
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ExtractionResultBase(BaseModel):
@@ -49,8 +47,7 @@ class ExtractionResultResponse(ExtractionResultBase):
     groups: List[PhysicalStateGroupResponse] = []
     result_json: Dict[str, Any]
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ExtractionResultEdit(BaseModel):
@@ -1,16 +1,47 @@
 import os
 import shutil
+import asyncio
+import concurrent.futures
 from datetime import datetime
-from typing import List, Optional
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from uuid import uuid4
 
 from fastapi import UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.models.document import Document
 
 
+def _write_upload(source, file_path: str) -> int:
+    """将上传文件的内容写入磁盘，返回文件大小（字节）"""
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
+    return os.path.getsize(file_path)
+
+
+def _remove_file(file_path: str) -> None:
+    """删除磁盘上的文件，文件不存在时忽略（直接删除并捕获异常，省去一次exists检查）"""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
+@lru_cache(maxsize=64)
+def _read_text_file(file_path: str, mtime_ns: int) -> str:
+    """读取UTF-8文本文件；以文件修改时间作为缓存键的一部分，文件被重写后自动重新读取"""
+    with open(file_path, "r", encoding="utf-8") as file:
+        return file.read()
+
+
+# 批量删除文档时并行删除磁盘文件的最大线程数
+_FILE_REMOVE_WORKERS = 8
+
+
 class DocumentService:
     def __init__(self, db: Session):
         self.db = db
@@ -19,6 +50,20 @@ class DocumentService:
         """
         上传单个文档并保存到数据库
         """
+        db_document = await self._save_file(file)
+
+        self.db.add(db_document)
+        self.db.commit()
+
+        return db_document
+
+    async def _save_file(self, file: UploadFile) -> Document:
+        """
+        检查文件类型并将上传的文件保存到上传目录
+        
+        返回：
+            尚未写入数据库的文档记录
+        """
         # 检查文件类型
         file_ext = file.filename.split(".")[-1].lower()
         if file_ext not in settings.ALLOWED_EXTENSIONS:
@@ -31,27 +76,20 @@ class DocumentService:
         unique_filename = f"{uuid4().hex}.{file_ext}"
         file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
 
-        # 保存文件
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # 保存文件（阻塞的磁盘写入放到线程池中执行，不占用事件循环）
+        file_size = await run_in_threadpool(_write_upload, file.file, file_path)
 
         # 创建文档记录
-        db_document = Document(
+        return Document(
             filename=unique_filename,
             original_filename=file.filename,
             file_path=file_path,
-            file_size=os.path.getsize(file_path),
+            file_size=file_size,
             file_type=file_ext,
             upload_time=datetime.now(),
             processed=False
         )
 
-        self.db.add(db_document)
-        self.db.commit()
-        self.db.refresh(db_document)
-
-        return db_document
-
     async def upload_documents(self, files: List[UploadFile]) -> List[Document]:
         """
         批量上传多个文档并保存到数据库
@@ -67,19 +105,31 @@ class DocumentService:
         
         uploaded_documents = []
         
-        for file in files:
-            try:
-                # 复用单个文件上传的方法
-                document = await self.upload_document(file)
-                uploaded_documents.append(document)
-            except Exception as e:
+        # 并发保存各个文件，文档记录最后一次性写入数据库
+        results = await asyncio.gather(*(self._save_file(file) for file in files), return_exceptions=True)
+        
+        for file, result in zip(files, results):
+            if isinstance(result, BaseException):
                 # 记录错误但继续处理其他文件
-                print(f"上传文件 {file.filename} 时出错: {str(e)}")
+                print(f"上传文件 {file.filename} 时出错: {str(result)}")
                 # 如果希望一个文件失败就中止整个过程，可以在此抛出异常
-                # raise HTTPException(status_code=500, detail=f"上传文件 {file.filename} 时出错: {str(e)}")
+                # raise HTTPException(status_code=500, detail=f"上传文件 {file.filename} 时出错: {str(result)}")
+                continue
+            uploaded_documents.append(result)
         
         if not uploaded_documents:
             raise HTTPException(status_code=500, detail="所有文件上传均失败")
+        
+        # 所有文档记录在一个事务中插入，只提交一次
+        self.db.add_all(uploaded_documents)
+        try:
+            self.db.commit()
+        except Exception:
+            # 提交失败时回滚，并删除已写入磁盘的文件，避免留下没有数据库记录的文件
+            self.db.rollback()
+            for document in uploaded_documents:
+                _remove_file(document.file_path)
+            raise
             
         return uploaded_documents
 
@@ -87,13 +137,26 @@ class DocumentService:
         """
         根据ID获取文档
         """
-        return self.db.query(Document).filter(Document.id == document_id).first()
+        return self.db.get(Document, document_id)
 
-    def get_all_documents(self, skip: int = 0, limit: int = 100) -> List[Document]:
+    def get_all_documents(self, skip: int = 0, limit: int = 100,
+                          cursor: Optional[Tuple[datetime, int]] = None) -> List[Document]:
         """
         获取所有文档，支持分页
+        
+        参数：
+            skip: 跳过的文档数量（偏移分页，页数越靠后越慢）
+            limit: 返回的最大文档数量
+            cursor: 上一页最后一个文档的(上传时间, ID)；提供时使用游标分页并忽略skip，
+                    每页查询耗时与页码无关
         """
-        return self.db.query(Document).order_by(Document.upload_time.desc()).offset(skip).limit(limit).all()
+        query = self.db.query(Document)
+        if cursor is not None:
+            query = query.filter(tuple_(Document.upload_time, Document.id) < tuple_(*cursor))
+        query = query.order_by(Document.upload_time.desc(), Document.id.desc())
+        if cursor is None:
+            query = query.offset(skip)
+        return query.limit(limit).all()
 
     def mark_document_as_processed(self, document_id: int, processing_time: float) -> Document:
         """
@@ -113,7 +176,6 @@ class DocumentService:
         document.processed = True
         document.processing_time = processing_time
         self.db.commit()
-        self.db.refresh(document)
         return document
 
     def delete_document(self, document_id: int) -> bool:
@@ -125,8 +187,7 @@ class DocumentService:
             raise HTTPException(status_code=404, detail="文档未找到")
 
         # 删除物理文件
-        if os.path.exists(document.file_path):
-            os.remove(document.file_path)
+        _remove_file(document.file_path)
 
         # 删除数据库记录（级联删除会处理关联的提取结果和编辑历史）
         self.db.delete(document)
@@ -150,26 +211,39 @@ class DocumentService:
         failed_count = 0
         failed_ids = []
         
+        # 一条查询取出所有要删除的文档
+        documents_by_id = {
+            document.id: document
+            for document in self.db.query(Document).filter(Document.id.in_(document_ids)).all()
+        }
+        
+        documents = []
         for doc_id in document_ids:
-            try:
-                document = self.get_document(doc_id)
-                if not document:
-                    failed_count += 1
-                    failed_ids.append(doc_id)
-                    continue
-                    
-                # 删除物理文件
-                if os.path.exists(document.file_path):
-                    os.remove(document.file_path)
-                
-                # 删除数据库记录
-                self.db.delete(document)
-                # 不要在这里commit，等全部处理完一次性提交
-                success_count += 1
-            except Exception as e:
+            document = documents_by_id.get(doc_id)
+            if not document:
                 failed_count += 1
                 failed_ids.append(doc_id)
-                print(f"删除文档ID {doc_id} 时出错: {str(e)}")
+                continue
+            documents.append(document)
+        
+        if documents:
+            # 在线程池中并行删除物理文件，重叠各文件的磁盘I/O
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=min(_FILE_REMOVE_WORKERS, len(documents))) as executor:
+                futures = [executor.submit(_remove_file, document.file_path) for document in documents]
+            
+            for document, future in zip(documents, futures):
+                try:
+                    future.result()
+                    
+                    # 删除数据库记录
+                    self.db.delete(document)
+                    # 不要在这里commit，等全部处理完一次性提交
+                    success_count += 1
+                except Exception as e:
+                    failed_count += 1
+                    failed_ids.append(document.id)
+                    print(f"删除文档ID {document.id} 时出错: {str(e)}")
         
         # 一次性提交所有更改
         if success_count > 0:
@@ -192,6 +266,30 @@ class DocumentService:
         返回：
             包含文档内容的字典
         """
+        document, content_file_path = self.get_document_content_path(document_id)
+            
+        # 读取文件内容（按路径和修改时间缓存，文件未变化时不再重复读盘）
+        try:
+            content = _read_text_file(content_file_path, os.stat(content_file_path).st_mtime_ns)
+            
+            return {
+                "document_id": document_id,
+                "filename": document.original_filename,
+                "content": content
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"读取文档内容时出错: {str(e)}")
+
+    def get_document_content_path(self, document_id: int) -> Tuple[Document, str]:
+        """
+        查找文档提取出的文本内容文件
+        
+        参数：
+            document_id: 文档ID
+            
+        返回：
+            (文档对象, 文本内容文件路径)
+        """
         document = self.get_document(document_id)
         if not document:
             raise HTTPException(status_code=404, detail="文档未找到")
@@ -210,16 +308,5 @@ class DocumentService:
         # 如果仍然找不到文件，返回错误
         if not os.path.exists(content_file_path):
             raise HTTPException(status_code=404, detail="文档内容文件未找到")
-            
-        # 读取文件内容
-        try:
-            with open(content_file_path, "r", encoding="utf-8") as file:
-                content = file.read()
-                
-            return {
-                "document_id": document_id,
-                "filename": document.original_filename,
-                "content": content
-            }
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"读取文档内容时出错: {str(e)}") 
\ No newline at end of file
+        
+        return document, content_file_path 
\ No newline at end of file
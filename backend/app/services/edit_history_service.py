@@ -1,29 +1,60 @@
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import json
 
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import exists, insert, tuple_
+from sqlalchemy.orm import Session, selectinload
 
 from app.models.edit_history import EditHistory
 from app.models.document import Document
 from app.models.extraction import ExtractionResult, PhysicalStateGroup, PhysicalStateItem
 
 
+# 判断物理状态项是否被编辑时比较的字段
+_ITEM_COMPARE_FIELDS = ("典型物理状态值", "禁限用信息", "测试评语", "试验项目")
+# 物理状态项的完整字段
+_ITEM_FIELDS = ("物理状态名称",) + _ITEM_COMPARE_FIELDS
+# 物理状态项字段及其在编辑历史中显示的名称
+_ITEM_FIELD_DISPLAY_NAMES = (
+    ("物理状态名称", "物理状态名称"),
+    ("典型物理状态值", "典型物理状态值"),
+    ("禁限用信息", "风险评价"),
+    ("测试评语", "测试评语"),
+    ("试验项目", "试验项目"),
+)
+# 回溯时编辑历史中的显示字段名到数据库字段名的映射
+_REVERT_FIELD_MAP = {
+    "物理状态名称": "state_name",
+    "典型物理状态值": "state_value",
+    "风险评价": "prohibition_info",
+    "测试评语": "test_comment",
+    "试验项目": "test_project",
+}
+
+
 class EditHistoryService:
     def __init__(self, db: Session):
         self.db = db
 
+    def _ensure_document_exists(self, document_id: int) -> None:
+        """
+        检查文档是否存在，不存在时抛出404；使用EXISTS查询，不加载整行文档记录
+        """
+        if not self.db.query(exists().where(Document.id == document_id)).scalar():
+            raise HTTPException(status_code=404, detail=f"文档ID {document_id} 不存在")
+
     def record_edit(self, document_id: int,
                    entity_type: str, entity_id: int, field_name: str,
-                   old_value: str, new_value: str) -> EditHistory:
+                   old_value: str, new_value: str, commit: bool = True) -> EditHistory:
         """
         记录编辑历史
+        
+        参数:
+            commit: 是否立即提交；在更大的事务中调用时传False，只flush，由调用方统一提交
         """
         # 检查文档是否存在
-        document = self.db.query(Document).filter(Document.id == document_id).first()
-        if not document:
-            raise HTTPException(status_code=404, detail=f"文档ID {document_id} 不存在")
+        self._ensure_document_exists(document_id)
 
         # 创建编辑历史记录
         edit_history = EditHistory(
@@ -37,18 +68,53 @@ class EditHistoryService:
         )
 
         self.db.add(edit_history)
-        self.db.commit()
-        self.db.refresh(edit_history)
+        if commit:
+            self.db.commit()
+        else:
+            self.db.flush()
 
         return edit_history
 
-    def get_document_edit_history(self, document_id: int, skip: int = 0, limit: int = 100) -> List[EditHistory]:
+    def _edit_history_row(self, document_id: int,
+                          entity_type: str, entity_id: int, field_name: str,
+                          old_value: str, new_value: str) -> Dict[str, Any]:
+        """
+        构造一条待批量写入的编辑历史记录
+        """
+        return {
+            "document_id": document_id,
+            "edit_time": datetime.now(),
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "field_name": field_name,
+            "old_value": old_value,
+            "new_value": new_value
+        }
+
+    def _record_edit_bulk(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        批量写入编辑历史，通过Core的insert()以executemany方式一次写入所有记录，
+        与组、项和提取结果的修改处于同一事务中，由调用方统一提交
+        """
+        if rows:
+            self.db.execute(insert(EditHistory), rows)
+
+    def get_document_edit_history(self, document_id: int, skip: int = 0, limit: int = 100,
+                                  cursor: Optional[Tuple[datetime, int]] = None) -> List[EditHistory]:
         """
         获取文档的编辑历史
+        
+        参数:
+            cursor: 上一页最后一条记录的(编辑时间, ID)；提供时使用游标分页并忽略skip，
+                    沿(document_id, edit_time)索引定位，每页查询耗时与页码无关
         """
-        return self.db.query(EditHistory).filter(
-            EditHistory.document_id == document_id
-        ).order_by(EditHistory.edit_time.desc()).offset(skip).limit(limit).all()
+        query = self.db.query(EditHistory).filter(EditHistory.document_id == document_id)
+        if cursor is not None:
+            query = query.filter(tuple_(EditHistory.edit_time, EditHistory.id) < tuple_(*cursor))
+        query = query.order_by(EditHistory.edit_time.desc(), EditHistory.id.desc())
+        if cursor is None:
+            query = query.offset(skip)
+        return query.limit(limit).all()
 
     def edit_extraction_result(self, document_id: int, edit_data: Dict[str, Any], 
                              extraction_service=None) -> Dict[str, Any]:
@@ -58,10 +124,13 @@ class EditHistoryService:
         参数:
             document_id: 文档ID
             edit_data: 编辑数据
-            extraction_service: 信息提取服务实例
+            extraction_service: 信息提取服务实例（保留以兼容调用方，结果直接由编辑数据构建）
         """
-        # 获取提取结果
-        extraction_result = self.db.query(ExtractionResult).filter(
+        # 获取提取结果，同时预加载物理状态组及其物理状态项（共三条查询），避免后续逐条查询
+        extraction_result = self.db.query(ExtractionResult).options(
+            selectinload(ExtractionResult.physical_state_groups)
+            .selectinload(PhysicalStateGroup.physical_state_items)
+        ).filter(
             ExtractionResult.document_id == document_id
         ).first()
 
@@ -69,7 +138,11 @@ class EditHistoryService:
             raise HTTPException(status_code=404, detail=f"文档ID {document_id} 的提取结果不存在")
 
         # 记录完整的原始数据作为历史记录
-        old_data = json.loads(extraction_result.result_json)
+        old_data = extraction_result.result_data
+        
+        # 提交的数据与当前结果完全相同（如未修改直接保存）时不做任何写入，也不产生编辑历史
+        if "groups" in edit_data and edit_data["groups"] == old_data.get("元器件物理状态分析", []):
+            return old_data
         
         # 处理删除操作已经移到前端，这部分代码不再需要
         # 现在前端会直接发送正确格式的groups数据
@@ -91,45 +164,30 @@ class EditHistoryService:
                             "试验项目": old_item.get("试验项目", "")
                         })
             
-            # 提取新数据中的物理状态项
-            new_physical_items = []
-            for new_group in edit_data["groups"]:
-                group_name = new_group.get("物理状态组", "")
-                for new_item in new_group.get("物理状态项", []):
-                    new_physical_items.append({
-                        "物理状态组": group_name,
-                        "物理状态名称": new_item.get("物理状态名称", ""),
-                        "典型物理状态值": new_item.get("典型物理状态值", ""),
-                        "禁限用信息": new_item.get("禁限用信息", ""),
-                        "测试评语": new_item.get("测试评语", ""),
-                        "试验项目": new_item.get("试验项目", "")
-                    })
-            
             # 查找并保存删除操作的记录列表，但暂不立即记录到数据库
             deleted_items_info = []
             
+            # 新数据中的(物理状态组, 物理状态名称)集合，用于O(1)判断旧条目是否仍然存在
+            new_item_keys = {
+                (new_group.get("物理状态组", ""), new_item.get("物理状态名称", ""))
+                for new_group in edit_data["groups"]
+                for new_item in new_group.get("物理状态项", [])
+            }
+            
+            # 由预加载的数据建立(物理状态组, 物理状态名称) -> 数据库记录的索引（同名时取第一个组、组内第一个项）
+            groups_by_name = {}
+            for group in extraction_result.physical_state_groups:
+                groups_by_name.setdefault(group.group_name, group)
+            db_items_by_key = {}
+            for group_name, group in groups_by_name.items():
+                for item in group.physical_state_items:
+                    db_items_by_key.setdefault((group_name, item.state_name), item)
+            
             # 查找删除的物理状态项（在旧数据中存在但在新数据中不存在）
             for old_item in old_physical_items:
-                found = False
-                for new_item in new_physical_items:
-                    if (old_item["物理状态组"] == new_item["物理状态组"] and 
-                        old_item["物理状态名称"] == new_item["物理状态名称"]):
-                        found = True
-                        break
-                
-                if not found:
-                    # 尝试查找对应的数据库记录
-                    deleted_item = None
-                    group = self.db.query(PhysicalStateGroup).filter(
-                        PhysicalStateGroup.extraction_result_id == extraction_result.id,
-                        PhysicalStateGroup.group_name == old_item["物理状态组"]
-                    ).first()
-                    
-                    if group:
-                        deleted_item = self.db.query(PhysicalStateItem).filter(
-                            PhysicalStateItem.physical_state_group_id == group.id,
-                            PhysicalStateItem.state_name == old_item["物理状态名称"]
-                        ).first()
+                if (old_item["物理状态组"], old_item["物理状态名称"]) not in new_item_keys:
+                    # 查找对应的数据库记录
+                    deleted_item = db_items_by_key.get((old_item["物理状态组"], old_item["物理状态名称"]))
                     
                     if deleted_item:
                         # 将删除信息保存到列表中，供后续记录
@@ -139,26 +197,41 @@ class EditHistoryService:
                             "old_value": json.dumps(old_item, ensure_ascii=False)
                         })
             
-            # 1. 首先查询需要删除的物理状态组
-            groups_to_delete = self.db.query(PhysicalStateGroup).filter(
-                PhysicalStateGroup.extraction_result_id == extraction_result.id
-            ).all()
+            # 1. 需要删除的物理状态组已随提取结果预加载
+            group_ids_to_delete = [group.id for group in extraction_result.physical_state_groups]
             
-            # 2. 删除每个组关联的物理状态项
-            for group in groups_to_delete:
+            if group_ids_to_delete:
+                # 2. 一条语句删除这些组关联的所有物理状态项
                 self.db.query(PhysicalStateItem).filter(
-                    PhysicalStateItem.physical_state_group_id == group.id
+                    PhysicalStateItem.physical_state_group_id.in_(group_ids_to_delete)
                 ).delete(synchronize_session=False)
-            
-            # 3. 删除物理状态组
-            self.db.query(PhysicalStateGroup).filter(
-                PhysicalStateGroup.extraction_result_id == extraction_result.id
-            ).delete(synchronize_session=False)
+                
+                # 3. 一条语句删除物理状态组（没有旧组时两条DELETE都跳过）
+                self.db.query(PhysicalStateGroup).filter(
+                    PhysicalStateGroup.extraction_result_id == extraction_result.id
+                ).delete(synchronize_session=False)
+                
+                # 批量删除不会同步会话，将预加载的旧组（级联其物理状态项）移出会话，
+                # 避免已删除的对象残留在标识映射中，并使提取结果的组集合在下次访问时重新加载
+                for group in extraction_result.physical_state_groups:
+                    self.db.expunge(group)
+                self.db.expire(extraction_result, ["physical_state_groups"])
             
             # 4. 添加新的物理状态组和物理状态项
             added_items_info = []  # 保存新增条目信息
             edited_items_info = []  # 保存编辑条目信息
             
+            # 原始数据中(物理状态组, 物理状态名称) -> 物理状态项，同名组中靠后的组优先、组内取第一个同名项
+            old_items_by_key = {}
+            for old_group in old_data.get("元器件物理状态分析", []):
+                group_items = {}
+                for old_item in old_group.get("物理状态项", []):
+                    group_items.setdefault(old_item.get("物理状态名称"), old_item)
+                for old_state_name, old_item in group_items.items():
+                    old_items_by_key[(old_group.get("物理状态组"), old_state_name)] = old_item
+            
+            # 新条目通过关系关联到所属的组，全部添加后只flush一次，由工作单元批量插入组和项并回填ID
+            new_items = []  # (物理状态项, 编辑数据, 原始数据)
             for group_idx, group_edit in enumerate(edit_data["groups"]):
                 group_name = group_edit.get("物理状态组")
                 
@@ -168,7 +241,6 @@ class EditHistoryService:
                     group_name=group_name
                 )
                 self.db.add(group)
-                self.db.flush()  # 获取ID
                 
                 # 添加物理状态项
                 if "物理状态项" in group_edit:
@@ -177,133 +249,95 @@ class EditHistoryService:
                         
                         # 创建新的物理状态项
                         item = PhysicalStateItem(
-                            physical_state_group_id=group.id,
+                            physical_state_group=group,
                             state_name=state_name,
                             state_value=item_edit.get("典型物理状态值", ""),
                             prohibition_info=item_edit.get("禁限用信息", ""),
                             test_comment=item_edit.get("测试评语", ""),
                             test_project=item_edit.get("试验项目", "")
                         )
-                        self.db.add(item)
-                        self.db.flush()  # 确保获取ID
                         
-                        # 定义字段映射
-                        field_map = {
-                            "典型物理状态值": "state_value",
-                            "禁限用信息": "prohibition_info",
-                            "测试评语": "test_comment",
-                            "试验项目": "test_project"
-                        }
+                        # 只设置反向关系不会把对象加入会话，需要显式添加
+                        self.db.add(item)
                         
                         # 查找原始数据中对应的值
-                        old_value = {}
-                        if "元器件物理状态分析" in old_data:
-                            for old_group in old_data["元器件物理状态分析"]:
-                                if old_group.get("物理状态组") == group_name:
-                                    for old_item in old_group.get("物理状态项", []):
-                                        if old_item.get("物理状态名称") == state_name:
-                                            old_value = old_item
-                                            break
-                        
-                        # 收集新增条目信息
-                        if not old_value:  # 如果是新添加的条目
-                            added_items_info.append({
-                                "entity_id": item.id,
-                                "state_name": state_name
-                            })
-                        else:
-                            # 对于编辑的条目，检查是否有字段发生变化
-                            has_changes = False
-                            for field_display, field_db in field_map.items():
-                                new_val = item_edit.get(field_display, "")
-                                old_val = old_value.get(field_display, "") if old_value else ""
-                                if new_val != old_val:
-                                    has_changes = True
-                                    break
-                            
-                            # 收集编辑条目信息
-                            if has_changes:
-                                # 构造完整的旧值
-                                complete_old_value = {
-                                    "物理状态名称": old_value.get("物理状态名称", ""),
-                                    "典型物理状态值": old_value.get("典型物理状态值", ""),
-                                    "禁限用信息": old_value.get("禁限用信息", ""),
-                                    "测试评语": old_value.get("测试评语", ""),
-                                    "试验项目": old_value.get("试验项目", "")
-                                }
-                                
-                                # 构造完整的新值
-                                complete_new_value = {
-                                    "物理状态名称": item_edit.get("物理状态名称", ""),
-                                    "典型物理状态值": item_edit.get("典型物理状态值", ""),
-                                    "禁限用信息": item_edit.get("禁限用信息", ""),
-                                    "测试评语": item_edit.get("测试评语", ""),
-                                    "试验项目": item_edit.get("试验项目", "")
-                                }
-                                
-                                edited_items_info.append({
-                                    "entity_id": item.id,
-                                    "old_value": json.dumps(complete_old_value, ensure_ascii=False),
-                                    "new_value": json.dumps(complete_new_value, ensure_ascii=False)
-                                })
+                        old_value = old_items_by_key.get((group_name, state_name), {})
+                        new_items.append((item, item_edit, old_value))
+            
+            self.db.flush()  # 获取所有组和项的ID
+            
+            for item, item_edit, old_value in new_items:
+                # 收集新增条目信息
+                if not old_value:  # 如果是新添加的条目
+                    added_items_info.append({
+                        "entity_id": item.id,
+                        "state_name": item.state_name
+                    })
+                else:
+                    # 对于编辑的条目，检查是否有字段发生变化
+                    has_changes = any(item_edit.get(field, "") != old_value.get(field, "")
+                                      for field in _ITEM_COMPARE_FIELDS)
+                    
+                    # 收集编辑条目信息（完整的旧值和新值）
+                    if has_changes:
+                        edited_items_info.append({
+                            "entity_id": item.id,
+                            "old_value": {field: old_value.get(field, "") for field in _ITEM_FIELDS},
+                            "new_value": {field: item_edit.get(field, "") for field in _ITEM_FIELDS}
+                        })
 
             # 3. 直接更新result_json字段为新数据
-            extraction_result.result_json = json.dumps({"元器件物理状态分析": edit_data["groups"]}, ensure_ascii=False)
+            extraction_result.result_json = {"元器件物理状态分析": edit_data["groups"]}
             
             # 更新操作历史记录 - 只有在数据库操作成功后才记录历史
+            # 所有历史记录先收集起来，最后与数据修改在同一事务中批量写入
+            edit_rows = []
             
             # 记录删除操作
             for deleted_item in deleted_items_info:
                 # 保存完整的物理状态项信息，而不仅仅是名称
-                self.record_edit(
+                edit_rows.append(self._edit_history_row(
                     document_id=document_id,
                     entity_type="PhysicalStateItem",
                     entity_id=deleted_item["entity_id"],
                     field_name="删除条目",  # 修改类型显示为"删除条目"
                     old_value=deleted_item["old_value"],  # 保存完整的物理状态项信息JSON
                     new_value=""  # 修改值为空
-                )
+                ))
             
             # 记录新增操作
             for added_item in added_items_info:
-                self.record_edit(
+                edit_rows.append(self._edit_history_row(
                     document_id=document_id,
                     entity_type="PhysicalStateItem",
                     entity_id=added_item["entity_id"],
                     field_name="添加条目",  # 修改类型显示为"添加条目"
                     old_value="",  # 原值为空
                     new_value=added_item["state_name"]  # 修改值为添加条目的物理状态名
-                )
+                ))
             
             # 记录编辑操作
             for edited_item in edited_items_info:
-                # 解析旧值和新值
-                old_data = json.loads(edited_item["old_value"])
-                new_data = json.loads(edited_item["new_value"])
+                old_fields = edited_item["old_value"]
+                new_fields = edited_item["new_value"]
                 
                 # 对比各个字段，找出变化的字段并记录
-                field_map = {
-                    "物理状态名称": "物理状态名称",
-                    "典型物理状态值": "典型物理状态值",
-                    "禁限用信息": "风险评价",
-                    "测试评语": "测试评语",
-                    "试验项目": "试验项目"
-                }
-                
-                for field_key, display_name in field_map.items():
-                    old_val = old_data.get(field_key, "")
-                    new_val = new_data.get(field_key, "")
+                for field_key, display_name in _ITEM_FIELD_DISPLAY_NAMES:
+                    old_val = old_fields[field_key]
+                    new_val = new_fields[field_key]
                     
                     # 只记录发生变化的字段
                     if old_val != new_val:
-                        self.record_edit(
+                        edit_rows.append(self._edit_history_row(
                             document_id=document_id,
                             entity_type="PhysicalStateItem",
                             entity_id=edited_item["entity_id"],
                             field_name=display_name,  # 修改类型显示为对应字段名称
                             old_value=old_val,  # 原值为修改前的值
                             new_value=new_val   # 修改值为修改后的值
-                        )
+                        ))
+            
+            self._record_edit_bulk(edit_rows)
         
         # 标记提取结果为已编辑
         extraction_result.is_edited = True
@@ -312,21 +346,8 @@ class EditHistoryService:
         # 提交更改
         self.db.commit()
         
-        # 返回更新后的提取结果
-        if extraction_service:
-            # 使用传入的提取服务实例
-            return extraction_service.get_extraction_result(document_id)
-        else:
-            # 如果没有传入提取服务实例，尝试创建一个（不推荐，但作为后备方案）
-            from app.services.extraction_service import InformationExtractionService
-            from app.api.deps import get_llm_extractor
-            
-            # 获取 LLMExtractor 单例
-            extractor = get_llm_extractor()
-            
-            # 创建包含数据库会话和提取器的服务实例
-            temp_extraction_service = InformationExtractionService(db=self.db, extractor=extractor)
-            return temp_extraction_service.get_extraction_result(document_id)
+        # result_json刚由编辑数据直接写入，直接返回内存中的结果，无需再从数据库读回
+        return extraction_result.result_data
 
     def revert_to_history_point(self, document_id: int, history_id: int, 
                                extraction_service=None) -> Dict[str, Any]:
@@ -336,7 +357,7 @@ class EditHistoryService:
         参数:
             document_id: 文档ID
             history_id: 编辑历史ID
-            extraction_service: 信息提取服务实例（可选）
+            extraction_service: 信息提取服务实例（保留以兼容调用方，结果直接由回溯后的数据构建）
             
         返回:
             回溯后的提取结果
@@ -344,9 +365,7 @@ class EditHistoryService:
         print(f"开始回溯文档 {document_id} 的历史记录 {history_id}")
         
         # 检查文档是否存在
-        document = self.db.query(Document).filter(Document.id == document_id).first()
-        if not document:
-            raise HTTPException(status_code=404, detail=f"文档ID {document_id} 不存在")
+        self._ensure_document_exists(document_id)
             
         # 获取目标历史记录
         target_history = self.db.query(EditHistory).filter(
@@ -380,15 +399,20 @@ class EditHistoryService:
             for i, edit in enumerate(later_edits):
                 print(f"历史记录[{i}]: ID={edit.id}, 时间={edit.edit_time}, 类型={edit.entity_type}, 字段={edit.field_name}")
         
+        # 一次查询取出所有涉及的物理状态项，避免逐条记录查询
+        item_ids = {edit.entity_id for edit in later_edits if edit.entity_type == "PhysicalStateItem"}
+        items_by_id = {
+            item.id: item
+            for item in self.db.query(PhysicalStateItem).filter(PhysicalStateItem.id.in_(item_ids)).all()
+        } if item_ids else {}
+        
         # 对每个编辑记录进行回溯操作
         for edit in later_edits:
             print(f"处理历史记录: {edit.id}, 类型: {edit.entity_type}, 字段: {edit.field_name}")
             
             # 根据实体类型和ID获取相应的实体
             if edit.entity_type == "PhysicalStateItem":
-                item = self.db.query(PhysicalStateItem).filter(
-                    PhysicalStateItem.id == edit.entity_id
-                ).first()
+                item = items_by_id.get(edit.entity_id)
                 
                 # 处理删除条目操作
                 if edit.field_name == "删除条目":
@@ -423,6 +447,9 @@ class EditHistoryService:
                         
                         print(f"从历史记录中获取到的信息: 物理状态名={state_name}, 组名={group_name}")
                         
+                        # 会话未开启autoflush，先写入之前回溯的字段修改，确保下面的查询看到最新状态
+                        self.db.flush()
+                        
                         # 检查物理状态组是否存在
                         group = self.db.query(PhysicalStateGroup).filter(
                             PhysicalStateGroup.extraction_result_id == extraction_result.id,
@@ -470,9 +497,7 @@ class EditHistoryService:
                     # 这是新增操作的撤销，需要删除条目
                     print(f"撤销添加条目操作，将删除条目: {item.id}, 状态名称: {item.state_name}")
                     # 先找到这个物理状态项所属的组
-                    group = self.db.query(PhysicalStateGroup).filter(
-                        PhysicalStateGroup.id == item.physical_state_group_id
-                    ).first()
+                    group = self.db.get(PhysicalStateGroup, item.physical_state_group_id)
                     
                     # 检查组是否存在
                     if group:
@@ -480,6 +505,7 @@ class EditHistoryService:
                         
                         # 删除物理状态项
                         self.db.delete(item)
+                        items_by_id.pop(item.id, None)
                         print(f"已删除物理状态项: {item.id}")
                         
                         # 检查组内是否还有其他物理状态项
@@ -495,28 +521,17 @@ class EditHistoryService:
                             self.db.delete(group)
                             print(f"已删除空物理状态组: {group.id}")
                         
-                        # 立即提交更改，确保后续查询能看到最新状态
+                        # 会话未开启autoflush，立即写入删除，确保后续查询能看到最新状态
                         self.db.flush()
                 
                 # 处理字段修改操作
-                elif item and edit.field_name in ["物理状态名称", "典型物理状态值", "风险评价", "测试评语", "试验项目"]:
+                elif item and edit.field_name in _REVERT_FIELD_MAP:
                     # 将显示字段名映射回数据库字段名
-                    field_map = {
-                        "物理状态名称": "state_name",
-                        "典型物理状态值": "state_value",
-                        "风险评价": "prohibition_info",
-                        "测试评语": "test_comment",
-                        "试验项目": "test_project"
-                    }
-                    
-                    db_field = field_map.get(edit.field_name)
-                    if db_field:
-                        old_value = getattr(item, db_field)
-                        # 回溯为旧值
-                        setattr(item, db_field, edit.old_value)
-                        print(f"已更新字段 {edit.field_name}: '{old_value}' -> '{edit.old_value}'")
-                        # 立即提交更改
-                        self.db.flush()
+                    db_field = _REVERT_FIELD_MAP[edit.field_name]
+                    old_value = getattr(item, db_field)
+                    # 回溯为旧值（修改在提交时统一写入数据库）
+                    setattr(item, db_field, edit.old_value)
+                    print(f"已更新字段 {edit.field_name}: '{old_value}' -> '{edit.old_value}'")
 
         # 删除目标历史记录及其之后的所有历史记录
         deleted_count = self.db.query(EditHistory).filter(
@@ -532,10 +547,12 @@ class EditHistoryService:
         # 重新构建结构化数据，更新result_json字段
         structured_info = {"元器件物理状态分析": []}
         
-        # 查询所有物理状态组和项
-        groups = self.db.query(PhysicalStateGroup).filter(
+        # 查询所有物理状态组，并通过selectinload一次性预加载各组的物理状态项
+        groups = self.db.query(PhysicalStateGroup).options(
+            selectinload(PhysicalStateGroup.physical_state_items)
+        ).filter(
             PhysicalStateGroup.extraction_result_id == extraction_result.id
-        ).all()
+        ).order_by(PhysicalStateGroup.id).all()
         
         print(f"重建结构化数据，找到 {len(groups)} 个物理状态组")
         
@@ -545,9 +562,7 @@ class EditHistoryService:
                 "物理状态项": []
             }
             
-            items = self.db.query(PhysicalStateItem).filter(
-                PhysicalStateItem.physical_state_group_id == group.id
-            ).all()
+            items = group.physical_state_items
             
             print(f"物理状态组 '{group.group_name}' 包含 {len(items)} 个物理状态项")
             
@@ -566,26 +581,12 @@ class EditHistoryService:
                 structured_info["元器件物理状态分析"].append(group_info)
         
         # 更新result_json字段
-        old_json = extraction_result.result_json
-        extraction_result.result_json = json.dumps(structured_info, ensure_ascii=False)
-        print(f"已更新result_json字段，旧值长度: {len(old_json) if old_json else 0}，新值长度: {len(extraction_result.result_json)}")
+        extraction_result.result_json = structured_info
+        print(f"已更新result_json字段，物理状态组数: {len(structured_info['元器件物理状态分析'])}")
         
         # 提交更改
         self.db.commit()
         print(f"回溯完成，已提交所有更改")
         
-        # 返回更新后的提取结果
-        if extraction_service:
-            # 使用传入的提取服务实例
-            return extraction_service.get_extraction_result(document_id)
-        else:
-            # 如果没有传入提取服务实例，尝试创建一个
-            from app.services.extraction_service import InformationExtractionService
-            from app.api.deps import get_llm_extractor
-            
-            # 获取 LLMExtractor 单例
-            extractor = get_llm_extractor()
-            
-            # 创建包含数据库会话和提取器的服务实例
-            temp_extraction_service = InformationExtractionService(db=self.db, extractor=extractor)
-            return temp_extraction_service.get_extraction_result(document_id) 
\ No newline at end of file
+        # result_json刚由回溯后的数据重新构建，直接返回内存中的结果，无需再通过提取服务从数据库读回
+        return extraction_result.result_data 
\ No newline at end of file
@@ -354,7 +354,7 @@ class InformationExtractionService:
             raise ValueError("数据库会话未初始化")
         
         # 查询文档
-        document = self.db.query(Document).filter(Document.id == document_id).first()
+        document = self.db.get(Document, document_id)
         if not document:
             raise ValueError(f"找不到ID为 {document_id} 的文档")
         
@@ -405,32 +405,25 @@ class InformationExtractionService:
             ExtractionResult.document_id == document_id
         ).first()
         
-        # 如果存在之前的结果，删除它
+        # 如果存在之前的结果，删除它（与新结果的写入处于同一事务中，最后统一提交）
         if existing_result:
             self.db.delete(existing_result)
-            self.db.commit()
+            self.db.flush()
         
         # 创建新的提取结果
         extraction_result = ExtractionResult(
             document_id=document_id,
-            result_json=json.dumps(structured_info, ensure_ascii=False),
+            result_json=structured_info,
             is_edited=False
         )
         
         self.db.add(extraction_result)
-        self.db.commit()
-        self.db.refresh(extraction_result)
         
-        # 创建物理状态组和物理状态项记录
+        # 创建物理状态组和物理状态项记录：通过父对象的关系集合关联，由级联加入会话，
+        # 提交时工作单元按依赖顺序批量插入并回填外键
         for group_info in structured_info.get("元器件物理状态分析", []):
-            group = PhysicalStateGroup(
-                extraction_result_id=extraction_result.id,
-                group_name=group_info.get("物理状态组", "未知组")
-            )
-            
-            self.db.add(group)
-            self.db.commit()
-            self.db.refresh(group)
+            group = PhysicalStateGroup(group_name=group_info.get("物理状态组", "未知组"))
+            extraction_result.physical_state_groups.append(group)
             
             # 创建物理状态项
             for item_info in group_info.get("物理状态项", []):
@@ -438,16 +431,13 @@ class InformationExtractionService:
                 if isinstance(state_value, dict):
                     state_value = json.dumps(state_value, ensure_ascii=False)
                 
-                item = PhysicalStateItem(
-                    physical_state_group_id=group.id,
+                group.physical_state_items.append(PhysicalStateItem(
                     state_name=item_info.get("物理状态名称", ""),
                     state_value=state_value,
                     prohibition_info=item_info.get("禁限用信息", ""),
                     test_comment=item_info.get("测试评语", ""),
                     test_project=item_info.get("试验项目", "")
-                )
-                
-                self.db.add(item)
+                ))
         
         self.db.commit()
         
@@ -475,7 +465,7 @@ class InformationExtractionService:
             return None
         
         # 返回JSON结果
-        return json.loads(extraction_result.result_json)
+        return extraction_result.result_data
     
     def batch_process(self, directory_path, output_dir=None, output_format="json"):
         """
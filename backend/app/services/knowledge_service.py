@@ -46,14 +46,13 @@ class KnowledgeBaseService:
         
         self.db.add(knowledge_item)
         self.db.commit()
-        self.db.refresh(knowledge_item)
         
         return knowledge_item
     
     def get_knowledge_item(self, item_id: int) -> Optional[KnowledgeBase]:
         """获取知识库条目"""
         
-        return self.db.query(KnowledgeBase).filter(KnowledgeBase.id == item_id).first()
+        return self.db.get(KnowledgeBase, item_id)
     
     def get_knowledge_by_state(self, physical_group_name: str, physical_state_name: str, 
                               test_item_name: Optional[str] = None) -> List[KnowledgeBase]:
@@ -140,7 +139,6 @@ class KnowledgeBaseService:
         knowledge_item.updated_at = datetime.now()
         
         self.db.commit()
-        self.db.refresh(knowledge_item)
         
         return knowledge_item
     
@@ -189,6 +187,19 @@ class KnowledgeBaseService:
         if "元器件物理状态分析" in extraction_data:
             physical_state_analysis = extraction_data["元器件物理状态分析"]
             
+            # 一次查询取出可能重复的已有条目，按与create_knowledge_item相同的字段在内存中查重，
+            # 避免每个条目单独查询和提交
+            group_names = {group.get("物理状态组", "") for group in physical_state_analysis} - {""}
+            existing_items = {}
+            if group_names:
+                for item in self.db.query(KnowledgeBase).filter(
+                    KnowledgeBase.source == "extraction",
+                    KnowledgeBase.physical_group_name.in_(group_names)
+                ).all():
+                    key = (item.physical_group_name, item.physical_state_name, item.test_item_name,
+                           item.physical_state_value)
+                    existing_items.setdefault(key, item)
+            
             for group in physical_state_analysis:
                 group_name = group.get("物理状态组", "")
                 if not group_name:
@@ -199,19 +210,32 @@ class KnowledgeBaseService:
                     if not state_name:
                         continue
                     
-                    # 创建知识库条目
-                    # 修正字段映射，正确获取数据
-                    knowledge_item = self.create_knowledge_item(
-                        physical_group_name=group_name,
-                        physical_state_name=state_name,
-                        test_item_name=state_item.get("试验项目", ""),  # 使用添加的试验项目字段
-                        physical_state_value=state_item.get("典型物理状态值", ""),  # 使用典型物理状态值
-                        risk_assessment=state_item.get("禁限用信息", ""),  # 使用禁限用信息
-                        detailed_analysis=state_item.get("测试评语", ""),  # 使用测试评语
-                        source="extraction",
-                        reference_id=extraction_result_id
-                    )
+                    test_item_name = state_item.get("试验项目", "")  # 使用添加的试验项目字段
+                    physical_state_value = state_item.get("典型物理状态值", "")  # 使用典型物理状态值
+                    
+                    # 已存在相同的条目时直接复用
+                    key = (group_name, state_name, test_item_name, physical_state_value)
+                    knowledge_item = existing_items.get(key)
+                    if knowledge_item is None:
+                        # 创建知识库条目
+                        # 修正字段映射，正确获取数据
+                        knowledge_item = KnowledgeBase(
+                            physical_group_name=group_name,
+                            physical_state_name=state_name,
+                            test_item_name=test_item_name,
+                            physical_state_value=physical_state_value,
+                            risk_assessment=state_item.get("禁限用信息", ""),  # 使用禁限用信息
+                            detailed_analysis=state_item.get("测试评语", ""),  # 使用测试评语
+                            source="extraction",
+                            reference_id=extraction_result_id,
+                            import_time=datetime.now()
+                        )
+                        self.db.add(knowledge_item)
+                        existing_items[key] = knowledge_item
                     
                     imported_items.append(knowledge_item)
+            
+            # 所有新条目一次提交
+            self.db.commit()
         
         return imported_items 
\ No newline at end of file
@@ -1,6 +1,10 @@
 import os
 import re
-import jieba
+try:
+    # 与rule_extractor使用同一分词实现，保证添加的专业术语对两者都生效
+    import jieba_fast as jieba
+except ImportError:
+    import jieba
 import subprocess
 import tempfile
 from typing import Dict, List, Any